@@ -1,19 +1,13 @@
 from fastapi import APIRouter, UploadFile, File, Form, Response, HTTPException
 from typing import Annotated
-import cv2
-import numpy as np
 
 from app.schemas.stego_schema import SteganoReponse, SteganoExtractReponse
+from app.services.steganography import codec
+from app.services.steganography.codec import MIME_TYPES
 from app.services.steganography.dct_steganographie_service import dctSteganographieService
 
 router = APIRouter()
 
-MIME_TYPES = {
-    "png": "image/png",
-    "jpeg": "image/jpeg",
-    "jpg": "image/jpeg",
-}
-
 @router.post("/hide", response_model=SteganoReponse, status_code=201)
 async def hideMessage(
     image: Annotated[UploadFile, File(description="Le fichier image (PNG ou JPEG)")],
@@ -22,20 +16,19 @@ async def hideMessage(
 ):
     image_bytes = await image.read()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    try:
+        img = codec.decode(image_bytes)
+    except ValueError:
         raise HTTPException(status_code=400, detail="Impossible de décoder l'image uploadée")
 
-    output_ext = (format_output or "png").lower().lstrip('.')
-    ext = f".{output_ext}"
+    output_ext = codec.normalize_format(format_output)
 
     stego_img = dctSteganographieService.embed_dct(img, secret_message)
 
-    success, buf = cv2.imencode(ext, stego_img)
-    if not success:
+    try:
+        stego_bytes = codec.encode(stego_img, output_ext).tobytes()
+    except ValueError:
         raise HTTPException(status_code=500, detail="Erreur lors de l'encodage de l'image stégo")
-    stego_bytes = buf.tobytes()
 
     media_type = MIME_TYPES.get(output_ext, "application/octet-stream")
     filename = f"stegano_image.{output_ext}"
@@ -53,9 +46,9 @@ async def extractMessage(
 ):
     image_bytes = await stego_image.read()
 
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img is None:
+    try:
+        img = codec.decode(image_bytes)
+    except ValueError:
         raise HTTPException(status_code=400, detail="Impossible de décoder l'image uploadée")
 
     secret_message = dctSteganographieService.extract_dct(img)
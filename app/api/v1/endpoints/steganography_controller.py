@@ -1,114 +1,281 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Response
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Annotated
+from typing import Annotated, List, Optional
+import asyncio
+import io
+import os
+import zipfile
 from app.core.database import get_session
 from app.core.auth import get_current_user
-from app.schemas.stego_schema import SteganoReponse, SteganoRequest, SteganoExtractReponse,SteganoExtractRequest
-from app.services.steganography.f5_steganography_service import F5_stegano
-from app.services.steganography.dct_steganographie_service import dctSteganographieService
-from app.services.steganography.lsb_steganography_service import lsbSteganographieService
-from app.services.steganography.qim_steganography import qimSteganographieService
+from app.schemas.stego_schema import SteganoReponse, SteganoExtractReponse, SteganoBatchExtractItem, SteganoCapacityItem
+from app.services.steganography import codec
+from app.services.steganography.codec import MIME_TYPES
+from app.services.steganography.registry import (
+    ENGINES, CapacityError, SignatureNotFoundError, capacities, get_engine, reveal_verified,
+)
 from app.services.cryptography.cryptography import SteganoCryptoService
 from app.services.user_service import user_service
-from app.core.config import get_settings
-import cv2
-import numpy as np
+from app.core.executor import get_executor
+from app.core.uploads import check_upload_size, iter_buffer, upload_buffer
 
 router = APIRouter()
 
-MIME_TYPES = {
-    "png": "image/png",
-    "jpeg": "image/jpeg",
-    "jpg": "image/jpeg",
-}
+def _engine_or_400(algo: Optional[str]):
+    try:
+        return get_engine(algo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_capacity_or_400(engine, upload: UploadFile, message: bytes):
+    # Engines that only need the image shape are checked from the file header,
+    # before the upload is decoded or a worker is taken; the others check in `hide`
+    if engine.needs_pixels:
+        return
+    try:
+        engine.check_capacity(codec.image_shape(upload.file), message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.post("/hide", response_model=SteganoReponse, status_code=201)
 async def hideMessage(
     image: Annotated[UploadFile, File(description="Le fichier image (PNG ou JPEG)")],
-    format_output: Annotated[str, Form(description="Le format de sortie de l'image ('JPEG', 'png')")],
+    format_output: Annotated[str, Form(description="Le format de sortie de l'image ('JPEG', 'png', 'webp')")],
+    algo: Annotated[Optional[str], Form(description="Algorithme ('f5', 'dct', 'lsb', 'qim'), STEGANO_ALGO par défaut")] = None,
     current_user: Annotated[object, Depends(get_current_user)] = None,
 ):
+    engine = _engine_or_400(algo)
     user_id = current_user.id
     secret_message = SteganoCryptoService.encrypt_for_user(user_id)
 
-    settings = get_settings()
-    algo = (settings.STEGANO_ALGO or "F5").lower()
-
-    image_bytes = await image.read()
-
-    try:
-        if algo == "f5":
-            stego_bytes = F5_stegano.hideSecretMessageInImage(
-                image_bytes,
+    # Decode straight from the spooled upload, without reading it into bytes
+    # (upload_buffer checks the upload size first)
+    with upload_buffer(image) as image_buffer:
+        _check_capacity_or_400(engine, image, secret_message)
+        try:
+            stego_buffer = await get_executor(engine.executor).run(
+                engine.hide,
+                image_buffer,
                 secret_message,
                 format_output,
             )
-        elif algo == "dct" or algo == "dct_stegano":
-            stego_bytes = dctSteganographieService.hideSecretMessageInImage(
-                image_bytes,
-                secret_message,
-                format_output
-            )
-        elif algo == "lsb":
-            stego_bytes = lsbSteganographieService.hideSecretMessageInImage(
-                image_bytes,
-                secret_message,
-                "png"
-            )
-        elif algo == "qim":
-            stego_bytes = qimSteganographieService.hideSecretMessageInImage(
-                image_bytes,
-                secret_message,
-                format_output,
-                delta=4
-            )
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported STEGANO_ALGO: {settings.STEGANO_ALGO}")
-    except Exception:
-        raise HTTPException(status_code=503, detail="Error when encoding the image");
+        except HTTPException:
+            raise
+        except CapacityError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            raise HTTPException(status_code=503, detail="Error when encoding the image");
 
-    output_format = format_output.lower().lstrip('.')
-    media_type = MIME_TYPES.get(output_format.lower(), "application/octet-stream")
+    output_format = engine.output_format(format_output)
+    media_type = MIME_TYPES.get(output_format, "application/octet-stream")
     filename = f"stego_image.{output_format}"
-    return Response(
-        content=stego_bytes, 
+    return StreamingResponse(
+        iter_buffer(stego_buffer),
         media_type=media_type,
         headers={
-            "Content-Disposition": f"attachment; filename=\"{filename}\""
+            "Content-Disposition": f"attachment; filename=\"{filename}\"",
+            "Content-Length": str(stego_buffer.nbytes),
         }
     )
 
 
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer: zipfile streams into it and the
+    response drains it after each archive member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@router.post("/hide/batch")
+async def hideMessages(
+    images: Annotated[List[UploadFile], File(description="Les fichiers image (PNG ou JPEG)")],
+    format_output: Annotated[str, Form(description="Le format de sortie des images ('JPEG', 'png', 'webp')")],
+    algo: Annotated[Optional[str], Form(description="Algorithme ('f5', 'dct', 'lsb', 'qim'), STEGANO_ALGO par défaut")] = None,
+    current_user: Annotated[object, Depends(get_current_user)] = None,
+):
+    engine = _engine_or_400(algo)
+    # One token for the whole batch
+    secret_message = SteganoCryptoService.encrypt_for_user(current_user.id)
+    output_format = engine.output_format(format_output)
+    executor = get_executor(engine.executor)
+
+    # Uploads are closed once the handler returns, read them before streaming. An
+    # empty or oversized file only gets its own error entry, it isn't read
+    uploads = []
+    for upload in images:
+        try:
+            check_upload_size(upload)
+        except HTTPException as e:
+            uploads.append((upload.filename or "image", None, e.detail))
+            continue
+        uploads.append((upload.filename or "image", await upload.read(), None))
+
+    async def hide_one(index: int, filename: str, image_bytes: Optional[bytes], error: Optional[str],
+                       limit: asyncio.Semaphore):
+        name = f"{index:04d}_{os.path.splitext(os.path.basename(filename))[0]}"
+        if error is not None:
+            return name, None, error
+        async with limit:
+            try:
+                stego_bytes = await executor.run(engine.hide, image_bytes, secret_message, format_output)
+                return f"{name}.{output_format}", stego_bytes, None
+            except HTTPException as e:
+                return name, None, e.detail
+            except CapacityError as e:
+                return name, None, str(e)
+            except Exception:
+                return name, None, "Error when encoding the image"
+
+    async def archive():
+        # Keep the batch within the pool size so other requests still get a slot
+        limit = asyncio.Semaphore(executor.workers)
+        tasks = [
+            asyncio.create_task(hide_one(i, filename, data, error, limit))
+            for i, (filename, data, error) in enumerate(uploads)
+        ]
+        sink = _ZipSink()
+        try:
+            with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive_file:
+                for task in asyncio.as_completed(tasks):
+                    name, stego_bytes, error = await task
+                    if error is None:
+                        archive_file.writestr(name, stego_bytes)
+                    else:
+                        archive_file.writestr(f"{name}.error.txt", error)
+                    yield sink.drain()
+            yield sink.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        archive(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": "attachment; filename=\"stego_images.zip\""
+        }
+    )
+
+
+@router.post("/capacity", response_model=List[SteganoCapacityItem])
+async def imageCapacity(
+    image: Annotated[UploadFile, File(description="Le fichier image (PNG ou JPEG)")],
+    algo: Annotated[Optional[str], Form(description="Algorithme ('f5', 'dct', 'lsb', 'qim'), tous par défaut")] = None,
+    current_user: Annotated[object, Depends(get_current_user)] = None,
+):
+    engines = [_engine_or_400(algo)] if algo else list(ENGINES.values())
+    names = [engine.name for engine in engines]
+    # Size of the token /hide would embed for this user
+    required = len(SteganoCryptoService.encrypt_for_user(current_user.id))
+
+    check_upload_size(image)
+    try:
+        if any(engine.needs_pixels for engine in engines):
+            # F5 counts the non-zero DCT coefficients: decode in a worker
+            with upload_buffer(image) as image_buffer:
+                result = await get_executor().run(capacities, image_buffer, names)
+        else:
+            result = capacities(image.file, names)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="Impossible de décoder l'image")
+
+    # `fits` only when guaranteed, see SteganoCapacityItem
+    return [
+        SteganoCapacityItem(algo=name, capacity_bytes=capacity, capacity_upper_bound=upper,
+                            required_bytes=required, fits=capacity >= required)
+        for name, (capacity, upper) in result.items()
+    ]
+
+
+def _verify_token(secret_message: bytes) -> int:
+    # Runs in the executor: a message is accepted only if it authenticates
+    # (compact binary token, or legacy base64 token of older images)
+    return int(SteganoCryptoService.decrypt_for_user(secret_message))
+
+
+def _extraction_target(algo: Optional[str]):
+    # Engines to try (None = all, cheapest first) and the pool to run them on
+    if algo is None or algo.lower() == "auto":
+        return None, get_executor()
+    engine = _engine_or_400(algo)
+    return [engine.name], get_executor(engine.executor)
+
+
 @router.post("/extract", response_model=SteganoExtractReponse, status_code=201)
 async def extractMessage(
     stego_image: Annotated[UploadFile, File(description="L'image stéganographiée (JPEG)")],
+    algo: Annotated[Optional[str], Form(description="Algorithme ('f5', 'dct', 'lsb', 'qim') ou 'auto' (défaut) pour tous les essayer")] = None,
     db: AsyncSession = Depends(get_session),
 ):
-    stego_bytes = await stego_image.read()
-    settings = get_settings()
-    algo = (settings.STEGANO_ALGO or "F5").lower()
+    names, executor = _extraction_target(algo)
 
-    try:
-        if algo == "f5":
-            secret_message = F5_stegano.extractSecretMessageFromImage(stego_bytes)
-        elif algo == "dct" or algo == "dct_stegano":
-            secret_message = dctSteganographieService.extractSecretMessageFromImage(stego_bytes)
-        elif algo == "lsb":
-            secret_message = lsbSteganographieService.extractSecretMessageFromImage(stego_bytes)
-        elif algo == "qim":
-            secret_message = qimSteganographieService.extractSecretMessageFromImage(stego_bytes, delta=4)
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported STEGANO_ALGO: {settings.STEGANO_ALGO}")
-    except Exception:
-        raise HTTPException(status_code=503, detail="Error when extracting message")
+    with upload_buffer(stego_image) as stego_buffer:
+        try:
+            _, user_id = await executor.run(reveal_verified, stego_buffer, _verify_token, names)
+        except HTTPException:
+            raise
+        except SignatureNotFoundError:
+            raise HTTPException(status_code=404, detail="User not found")
+        except Exception:
+            raise HTTPException(status_code=503, detail="Error when extracting message")
 
-    try:
-        user_id = SteganoCryptoService.decrypt_for_user(secret_message)
-    except ValueError:
-        raise HTTPException(status_code=404, detail="User not found")
-    user = await user_service.get_user_by_id(db, int(user_id))
+    user = await user_service.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return SteganoExtractReponse(nom=user.nom, prenom=user.prenom)
 
-    
+
+@router.post("/extract/batch", response_model=List[SteganoBatchExtractItem])
+async def extractMessages(
+    stego_images: Annotated[List[UploadFile], File(description="Les images stéganographiées")],
+    algo: Annotated[Optional[str], Form(description="Algorithme ('f5', 'dct', 'lsb', 'qim') ou 'auto' (défaut) pour tous les essayer")] = None,
+    db: AsyncSession = Depends(get_session),
+):
+    names, executor = _extraction_target(algo)
+    # Keep the batch within the pool size so other requests still get a slot
+    limit = asyncio.Semaphore(executor.workers)
+
+    async def reveal_one(upload: UploadFile):
+        async with limit:
+            try:
+                with upload_buffer(upload) as stego_buffer:
+                    _, user_id = await executor.run(reveal_verified, stego_buffer, _verify_token, names)
+                return user_id, None
+            except SignatureNotFoundError:
+                return None, "User not found"
+            except HTTPException as e:
+                return None, e.detail
+            except Exception:
+                return None, "Error when extracting message"
+
+    results = await asyncio.gather(*(reveal_one(upload) for upload in stego_images))
+
+    # All owners in a single query
+    user_ids = {user_id for user_id, _ in results if user_id is not None}
+    users = {user.id: user for user in await user_service.get_users_by_ids(db, user_ids)}
+
+    items = []
+    for upload, (user_id, error) in zip(stego_images, results):
+        user = users.get(user_id)
+        if user:
+            items.append(SteganoBatchExtractItem(filename=upload.filename, nom=user.nom, prenom=user.prenom))
+        else:
+            items.append(SteganoBatchExtractItem(filename=upload.filename, error=error or "User not found"))
+    return items
@@ -95,11 +95,11 @@ async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_sessio
     if not user or not verify_password(credentials.mdp, user.mdp):
         raise HTTPException(status_code=401, detail="Unauthorized")
     user_payload = UserResponse.from_orm(user).dict()
-    token = create_access_token({"user": user_payload})
+    token = create_access_token({"sub": str(user.id), "user": user_payload})
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.post("/logout")
 async def logout(auth: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    revoke_token(auth.credentials)
+    await revoke_token(auth.credentials)
     return {"detail": "Logged out"}
@@ -1,21 +1,23 @@
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.core import get_settings
 from app.services.user_service import user_service
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_session
+from app.core.revocation import get_revocation_store
 
 settings = get_settings()
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Kept revoked this long if a token has no `exp` (default lifetime below)
+REVOKED_WITHOUT_EXP = timedelta(days=3)
 
 bearer_scheme = HTTPBearer()
-token_blacklist = set()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = timedelta(days=3)) -> str:
@@ -39,20 +41,96 @@ def decode_access_token(token: str) -> dict:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+class AuthContext:
+    """Authentication state of one request, shared by every dependency that resolves it.
+
+    Everything is lazy and done at most once per request: the bearer token is
+    decoded on first use, and the revocation check and the user query only run
+    when a route asks for the user. Failures are cached too, so asking twice
+    raises the same 401 without doing the work again.
+    """
+
+    def __init__(self, token: Optional[str]):
+        self.token = token
+        self._payload: Optional[dict] = None
+        self._user = None
+        self._error: Optional[HTTPException] = None
+
+    @classmethod
+    def from_request(cls, request: Request) -> "AuthContext":
+        auth_header = request.headers.get("authorization")
+        if auth_header and auth_header.lower().startswith("bearer "):
+            return cls(auth_header.split(" ", 1)[1].strip())
+        return cls(None)
+
+    def _fail(self, detail: str) -> HTTPException:
+        self._error = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+        return self._error
+
+    @property
+    def payload(self) -> dict:
+        """Claims of the token, checked once (signature and expiry)."""
+        if self._error:
+            raise self._error
+        if self._payload is None:
+            if not self.token:
+                raise self._fail("Not authenticated")
+            try:
+                self._payload = decode_access_token(self.token)
+            except HTTPException as exc:
+                self._error = exc
+                raise
+        return self._payload
+
+    @property
+    def user_id(self) -> int:
+        # `sub` is the standard claim; tokens issued before it was set only have user.id
+        user_id = self.payload.get("sub") or self.payload.get("user", {}).get("id")
+        if user_id is None:
+            raise self._fail("Invalid token payload")
+        return int(user_id)
+
+    async def get_user(self, db: AsyncSession):
+        """The token's user, loaded with `db` on the first call only."""
+        if self._user is None:
+            user_id = self.user_id
+            # Signature and expiry first: a bad token costs no store lookup
+            if await is_token_revoked(self.token):
+                raise self._fail("Token revoked")
+            user = await user_service.get_user_by_id(db, user_id)
+            if not user:
+                raise self._fail("User not found")
+            self._user = user
+        return self._user
+
+
+def get_auth_context(request: Request) -> AuthContext:
+    """The request's AuthContext, created on first use and kept on request.state.auth."""
+    context = getattr(request.state, "auth", None)
+    if context is None:
+        context = request.state.auth = AuthContext.from_request(request)
+    return context
+
+
+async def get_current_user(request: Request,
+                           credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
                            db: AsyncSession = Depends(get_session)):
-    token = credentials.credentials
-    if token in token_blacklist:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
-    payload = decode_access_token(token)
-    user_id = payload.get("user", {}).get("id");
-    if user_id is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = await user_service.get_user_by_id(db, int(user_id))
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    context = get_auth_context(request)
+    user = await context.get_user(db)
+    request.state.current_user = user
     return user
 
 
-def revoke_token(token: str) -> None:
-    token_blacklist.add(token)
+async def is_token_revoked(token: str) -> bool:
+    return await get_revocation_store().is_revoked(token)
+
+
+async def revoke_token(token: str) -> None:
+    # Only tokens this server signed need to be remembered, until their `exp`
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except jwt.PyJWTError:
+        return
+    expires_at = payload.get("exp") or int((datetime.utcnow() + REVOKED_WITHOUT_EXP).timestamp())
+    await get_revocation_store().revoke(token, int(expires_at))
+
@@ -11,10 +11,42 @@ class Settings(BaseSettings):
     MY_SQL_PORT: int = 3306
     SECRET_KEY: str = "secret_key_1234"
     ALGORITHM: str = "HS256"
+    # Revoked access tokens (logout): 'memory' (per worker) or 'sql' (shared, in
+    # the application database, or in TOKEN_REVOCATION_URL if set)
+    TOKEN_REVOCATION_BACKEND: str = "memory"
+    TOKEN_REVOCATION_URL: str = ""
     CRYPTO_MASTER_KEY: str = ""
     CRYPTO_SALT_KEY: str = "salt"
+    # Key rotation: id of CRYPTO_MASTER_KEY (written in new tokens, 0 = the
+    # original key, whose tokens carry no id) and the retired keys still accepted
+    # when reading a token, as "id:hex,id:hex"
+    CRYPTO_KEY_ID: int = 0
+    CRYPTO_RETIRED_KEYS: str = ""
+    # Compact signature tokens: add the issue time (+5 bytes), and a random 4-byte
+    # nonce so that two tokens of the same user can't be linked. Without the
+    # nonce AES-SIV is deterministic: all the images of a user carry the same token
+    CRYPTO_TOKEN_TIMESTAMP: bool = False
+    CRYPTO_TOKEN_NONCE: bool = True
     # steganography algorithm to use for hide/extract operations (e.g. 'F5' or 'DCT')
     STEGANO_ALGO: str = "F5"
+    # CPU-bound steganography jobs: pool kind ('process' or 'thread'), worker count
+    # (0 = number of cores), max queued/running jobs before 503, per-job timeout (s)
+    STEGANO_EXECUTOR: str = "process"
+    STEGANO_WORKERS: int = 0
+    STEGANO_MAX_PENDING: int = 32
+    STEGANO_JOB_TIMEOUT: float = 60.0
+    # Upload limits (bytes): per image file, and per request body (batch endpoints)
+    STEGANO_MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    STEGANO_MAX_REQUEST_BYTES: int = 512 * 1024 * 1024
+    # Stego image encoding: 'fast', 'balanced' or 'smallest' (lossless size/speed
+    # trade-off only, see app.services.steganography.codec.ENCODE_PROFILES)
+    STEGANO_OUTPUT_PROFILE: str = "fast"
+    # F5/DCT only transform the bands of rows that carry the message; a non-empty
+    # key shuffles the order of those bands. The key is server-wide, not per user:
+    # auto-detection on /extract has to find the bands before it can read the token
+    # that names the user. Setting or changing it makes every image written with
+    # the previous order unreadable (no fallback order is tried)
+    STEGANO_TILE_KEY: str = ""
 
     @property
     def DATABASE_URL(self) -> str:
@@ -0,0 +1,121 @@
+# app/core/executor.py
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+
+
+class JobExecutor:
+    """Runs CPU-bound jobs off the event loop with bounded queue depth.
+
+    - kind "process": a process pool, for pure Python / NumPy work holding the GIL
+    - kind "thread": a thread pool, for OpenCV paths that release the GIL
+    - at most `max_pending` jobs may be queued or running; extra jobs get a 503
+    - a job that does not finish within `timeout` seconds gets a 504; queued jobs
+      are dropped, running ones are left to finish in the background
+    - if a worker process dies (e.g. OOM kill) the jobs it broke get a 503 and
+      the pool is replaced on the next job
+    """
+
+    def __init__(self, kind: str = "process", workers: Optional[int] = None,
+                 max_pending: int = 32, timeout: Optional[float] = 60.0):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stegano")
+        return self._pool
+
+    def _discard_pool(self, pool: Executor) -> None:
+        # A broken pool refuses every job: forget it, `_get_pool` starts a new one
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Server busy, retry later")
+            self._pending += 1
+        if self.kind == "process":
+            # Buffers shared with the request (memoryview) can't be pickled to a worker
+            args = tuple(bytes(arg) if isinstance(arg, memoryview) else arg for arg in args)
+        pool = self._get_pool()
+        try:
+            future = pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._release(None)
+            self._discard_pool(pool)
+            raise self._worker_crashed()
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is released when the job really ends, not when the caller gives up
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail="Steganography job timed out")
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise self._worker_crashed()
+
+    @staticmethod
+    def _worker_crashed() -> HTTPException:
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                             detail="Steganography worker crashed, retry later")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_executors: Dict[str, JobExecutor] = {}
+
+
+def get_executor(kind: Optional[str] = None) -> JobExecutor:
+    settings = get_settings()
+    kind = (kind or settings.STEGANO_EXECUTOR).lower()
+    if kind not in _executors:
+        _executors[kind] = JobExecutor(
+            kind=kind,
+            workers=settings.STEGANO_WORKERS or None,
+            max_pending=settings.STEGANO_MAX_PENDING,
+            timeout=settings.STEGANO_JOB_TIMEOUT or None,
+        )
+    return _executors[kind]
+
+
+def shutdown_executors() -> None:
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
@@ -1,6 +1,7 @@
 from app.core.database import engine
 from app.models.users import User
 from app.models.signatureimage import SignatureImage
+from app.models.revoked_token import RevokedToken
 from app.models import Base
 
 async def init_db():
@@ -0,0 +1,140 @@
+# app/core/revocation.py
+import hashlib
+import heapq
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import database
+from app.core.config import get_settings
+from app.models import Base
+from app.models.revoked_token import RevokedToken
+
+
+def token_digest(token: str) -> bytes:
+    # Entries are keyed by the SHA-256 of the token, not the token itself
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class RevocationStore:
+    """Revoked access tokens, each kept only until its own `exp`.
+
+    A token past its `exp` is rejected by the JWT check anyway, so an entry is
+    dropped as soon as the token it revokes expires: the store only holds the
+    revoked tokens that are still alive.
+    """
+
+    async def revoke(self, token: str, expires_at: int) -> None:
+        raise NotImplementedError
+
+    async def is_revoked(self, token: str) -> bool:
+        raise NotImplementedError
+
+
+class MemoryRevocationStore(RevocationStore):
+    """Per-process store: a dict digest -> exp plus a heap ordered by exp.
+
+    Expired entries are evicted on every call, oldest first, so memory is one
+    (32-byte digest, exp) pair per revoked token that is still alive. Not shared
+    between workers.
+    """
+
+    def __init__(self):
+        self._expires: Dict[bytes, int] = {}
+        self._heap: List[Tuple[int, bytes]] = []
+
+    def _evict(self, now: float) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, digest = heapq.heappop(self._heap)
+            # Skip stale heap items of a digest revoked again with a later exp
+            if self._expires.get(digest) == expires_at:
+                del self._expires[digest]
+
+    def add(self, digest: bytes, expires_at: int) -> None:
+        now = time.time()
+        self._evict(now)
+        if expires_at <= now or self._expires.get(digest, 0) >= expires_at:
+            return
+        self._expires[digest] = expires_at
+        heapq.heappush(self._heap, (expires_at, digest))
+
+    def contains(self, digest: bytes) -> bool:
+        self._evict(time.time())
+        return digest in self._expires
+
+    async def revoke(self, token: str, expires_at: int) -> None:
+        self.add(token_digest(token), expires_at)
+
+    async def is_revoked(self, token: str) -> bool:
+        return self.contains(token_digest(token))
+
+    def __len__(self) -> int:
+        self._evict(time.time())
+        return len(self._expires)
+
+
+class SqlRevocationStore(RevocationStore):
+    """Store shared by every worker, in the `revoked_tokens` table.
+
+    Uses the application database (`app.core.database`) by default, or its own
+    engine when `url` is given, e.g. "sqlite+aiosqlite:///./revoked_tokens.db"
+    for workers on a single host. Expired rows are purged when a token is
+    revoked. Tokens found revoked are also remembered in memory until their
+    `exp`, since a revocation can't be undone.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self._url = url
+        self._session_factory = None
+        self._seen = MemoryRevocationStore()
+
+    async def _session(self) -> AsyncSession:
+        if self._url is None:
+            # Looked up on each call: tests and scripts may rebind SessionLocal
+            return database.SessionLocal()
+        if self._session_factory is None:
+            engine = create_async_engine(self._url)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=[RevokedToken.__table__])
+            self._session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        return self._session_factory()
+
+    async def revoke(self, token: str, expires_at: int) -> None:
+        digest = token_digest(token)
+        async with await self._session() as session:
+            await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= int(time.time())))
+            await session.merge(RevokedToken(token_hash=digest.hex(), expires_at=expires_at))
+            await session.commit()
+        self._seen.add(digest, expires_at)
+
+    async def is_revoked(self, token: str) -> bool:
+        digest = token_digest(token)
+        if self._seen.contains(digest):
+            return True
+        async with await self._session() as session:
+            expires_at = await session.scalar(
+                select(RevokedToken.expires_at).where(
+                    RevokedToken.token_hash == digest.hex(),
+                    RevokedToken.expires_at > int(time.time()),
+                )
+            )
+        if expires_at is None:
+            return False
+        self._seen.add(digest, expires_at)
+        return True
+
+
+@lru_cache()
+def get_revocation_store() -> RevocationStore:
+    """The store selected by TOKEN_REVOCATION_BACKEND ('memory' or 'sql')."""
+    settings = get_settings()
+    backend = settings.TOKEN_REVOCATION_BACKEND.lower()
+    if backend == "memory":
+        return MemoryRevocationStore()
+    if backend == "sql":
+        return SqlRevocationStore(settings.TOKEN_REVOCATION_URL or None)
+    raise ValueError(f"Unsupported token revocation backend: {settings.TOKEN_REVOCATION_BACKEND}")
@@ -0,0 +1,161 @@
+# app/core/uploads.py
+import io
+import mmap
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import get_settings
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies larger than `max_bytes` while they are received.
+
+    A declared Content-Length over the limit is refused before the body is read;
+    otherwise the bytes are counted as they arrive and reading stops as soon as
+    the limit is crossed, before the multipart parser spools the rest to disk.
+    The app then sees a failing body (which it reports as it likes, usually a
+    400 from the form parser): that response is dropped and a 413 is sent
+    instead, if nothing was sent yet.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse({"detail": "Request body too large"},
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = -1
+            if declared < 0:
+                response = JSONResponse({"detail": "Invalid Content-Length"},
+                                        status_code=status.HTTP_400_BAD_REQUEST)
+                await response(scope, receive, send)
+                return
+            if declared > self.max_bytes:
+                await self._too_large()(scope, receive, send)
+                return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                raise _BodyTooLarge()
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded and not started:
+                # Whatever the app answers to the truncated body, the 413 wins
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # _BodyTooLarge itself, or re-wrapped by the form parser/middlewares
+            if not exceeded or started:
+                raise
+        if exceeded and not started:
+            await self._too_large()(scope, receive, send)
+
+
+def _upload_size(upload: UploadFile) -> int:
+    if upload.size is not None:
+        return upload.size
+    position = upload.file.tell()
+    upload.file.seek(0, 2)
+    size = upload.file.tell()
+    upload.file.seek(position)
+    return size
+
+
+def check_upload_size(upload: UploadFile, max_bytes: Optional[int] = None) -> int:
+    max_bytes = max_bytes or get_settings().STEGANO_MAX_UPLOAD_BYTES
+    size = _upload_size(upload)
+    if size > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"{upload.filename or 'File'} is larger than {max_bytes} bytes")
+    if size == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"{upload.filename or 'File'} is empty")
+    return size
+
+
+@contextmanager
+def upload_buffer(upload: UploadFile, max_bytes: Optional[int] = None) -> Iterator[memoryview]:
+    """Expose the spooled upload as a read-only buffer, without copying it.
+
+    Small uploads still held in memory by the SpooledTemporaryFile are shared
+    through `BytesIO.getbuffer()`, larger ones rolled to disk are memory-mapped;
+    any other file object is read into bytes. The buffer is only valid inside
+    the `with` block.
+    """
+    check_upload_size(upload, max_bytes)
+    spooled = upload.file
+    memory_file = getattr(spooled, "_file", spooled)
+    mapped = None
+    if isinstance(memory_file, io.BytesIO):
+        # Not rolled to disk yet (SpooledTemporaryFile), or a plain BytesIO
+        view = memory_file.getbuffer()
+    else:
+        try:
+            mapped = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            # No mappable file descriptor: fall back to a copy
+            spooled.seek(0)
+            view = memoryview(spooled.read())
+            spooled.seek(0)
+    try:
+        yield view
+    finally:
+        try:
+            view.release()
+            if mapped is not None:
+                mapped.close()
+        except BufferError:
+            # Still used by a job that outlived the request (timeout), the
+            # buffer is released when that job drops its last reference
+            pass
+
+
+def iter_buffer(buf, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield `buf` in chunks for a StreamingResponse.
+
+    Only one chunk at a time is copied to bytes, the encoded image itself is
+    never duplicated as a whole.
+    """
+    view = memoryview(buf).cast("B")
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, String
+from app.models import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    # SHA-256 (hex) of the JWT: fixed size whatever the token length
+    token_hash = Column(String(64), primary_key=True)
+    # `exp` of the token (unix time); the row is useless afterwards
+    expires_at = Column(BigInteger, nullable=False, index=True)
@@ -2,7 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.users import User
 from app.repositories.base_repository import BaseRepository
-from typing import Optional
+from typing import Iterable, List, Optional
 
 class UserRepository(BaseRepository[User]):
     def __init__(self):
@@ -11,6 +11,13 @@ class UserRepository(BaseRepository[User]):
     async def get_by_login(self, db: AsyncSession, login: str) -> Optional[User]:
         return await self.get_by_field(db, "login", login)
     
+    async def get_by_ids(self, db: AsyncSession, ids: Iterable[int]) -> List[User]:
+        ids = list(ids)
+        if not ids:
+            return []
+        result = await db.execute(select(User).where(User.id.in_(ids)))
+        return result.scalars().all()
+
     async def login_exists(self, db: AsyncSession, login: str, exclude_id: Optional[int] = None) -> bool:
         query = select(User).where(User.login == login)
         if exclude_id:
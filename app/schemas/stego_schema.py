@@ -18,3 +18,17 @@ class SteganoExtractReponse(BaseModel):
     nom: str = None
     prenom: str = None
 
+class SteganoBatchExtractItem(BaseModel):
+    filename: str
+    nom: Optional[str] = None
+    prenom: Optional[str] = None
+    error: Optional[str] = None
+
+class SteganoCapacityItem(BaseModel):
+    algo: str
+    # Guaranteed to fit; a message up to capacity_upper_bound may fit as well
+    # (F5: depends on the coefficients that shrink to 0 while embedding)
+    capacity_bytes: int
+    capacity_upper_bound: int
+    required_bytes: int
+    fits: bool
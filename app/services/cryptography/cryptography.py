@@ -1,16 +1,104 @@
 # services/stegano_crypto.py
 
 import base64
-from typing import Optional
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 import os
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from cryptography.hazmat.primitives.ciphers.aead import AESSIV, ChaCha20Poly1305
 from app.core.config import get_settings
 
 ALPH = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 settings = get_settings()
 
+# Compact binary token, version 1:
+#   header (1 byte: version << 4 | flags) | [key id, varint] | [nonce, 4 bytes]
+#   | AES-SIV(varint user id [| varint issued-at]) = 16-byte SIV + ciphertext
+# Everything before the SIV is authenticated as associated data. The version
+# nibble (1) is a control character, so a compact token never starts like a
+# legacy base64 token (ChaCha20-Poly1305, nonce + ciphertext + tag).
+#
+# Measured sizes (user ids 1 to 10**6, key 0, no timestamp): 22 to 24 bytes with
+# the default nonce, 18 to 20 bytes without, against 40 to 48 ASCII characters
+# for the legacy token. The default cuts the embedded bits by 45 to 50% only, not
+# by more than half: the 16-byte SIV is the authentication tag and can't shrink,
+# and a shorter nonce makes tokens of the same user linkable sooner. Deployments
+# that need the smallest payload set CRYPTO_TOKEN_NONCE=False (55 to 58% less).
+# A key id other than 0 adds 1 byte (2 from id 128).
+TOKEN_VERSION = 1
+FLAG_TIMESTAMP = 0x1
+FLAG_NONCE = 0x2
+FLAG_KEY_ID = 0x4
+TOKEN_NONCE_BYTES = 4
+
+
+class SignatureToken(NamedTuple):
+    user_id: int
+    issued_at: Optional[int] = None
+    key_id: int = 0
+
+
+def _varint(value: int) -> bytes:
+    # LEB128 : 7 bits par octet, bit de poids fort = suite
+    if value < 0:
+        raise ValueError("Varint values must be positive")
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Invalid varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def _parse_master_key(master_key_hex: str) -> bytes:
+    try:
+        master_key = bytes.fromhex(master_key_hex)
+    except ValueError as exc:
+        raise RuntimeError(f"The key must be a valid hex string.") from exc
+
+    if len(master_key) != 32:
+        raise RuntimeError(f"The key must be 32 bytes (64 hex chars).")
+    return master_key
+
+
+def _parse_retired_keys(value: str) -> Dict[int, bytes]:
+    # "id:hex,id:hex" (CRYPTO_RETIRED_KEYS)
+    keys = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        key_id, sep, master_key_hex = entry.partition(":")
+        if not sep or not key_id.strip().isdigit():
+            raise RuntimeError(f"Retired keys must be given as 'id:hex', got {entry!r}.")
+        if int(key_id) in keys:
+            raise RuntimeError(f"Duplicate key id {int(key_id)} in CRYPTO_RETIRED_KEYS.")
+        keys[int(key_id)] = _parse_master_key(master_key_hex.strip())
+    return keys
+
+
+class _TokenKeys(NamedTuple):
+    # Sub-keys derived from one master key
+    aead: ChaCha20Poly1305
+    siv: AESSIV
+
+
 class SteganoCryptoService:
     def __init__(self):
         master_key_hex = settings.CRYPTO_MASTER_KEY
@@ -19,57 +107,147 @@ class SteganoCryptoService:
                 f"Generate a 32-byte random key and set it as hex in your environment."
             )
 
-        try:
-            master_key = bytes.fromhex(master_key_hex)
-        except ValueError as exc:
-            raise RuntimeError(f"The key must be a valid hex string.") from exc
-
-        if len(master_key) != 32:
-            raise RuntimeError(f"The key must be 32 bytes (64 hex chars).")
+        master_keys = _parse_retired_keys(settings.CRYPTO_RETIRED_KEYS)
+        self._key_id = settings.CRYPTO_KEY_ID
+        if self._key_id in master_keys:
+            raise RuntimeError(f"CRYPTO_KEY_ID {self._key_id} is also a retired key id.")
+        self._master_key = master_keys[self._key_id] = _parse_master_key(master_key_hex)
 
-        self._master_key = master_key
+        # Keyring: the sub-keys of every master key are derived once, up front.
+        # Tokens name their key id, so reading one is a dict lookup, however many
+        # keys were retired. The AEAD instances hold no per-message state and are
+        # shared by every call (and thread)
+        self._keys: Dict[int, _TokenKeys] = {
+            key_id: _TokenKeys(
+                ChaCha20Poly1305(self._derive_key(master_key=master_key)),
+                AESSIV(self._derive_key(b"stegano-aes-siv-token-key", 64, master_key)),
+            )
+            for key_id, master_key in master_keys.items()
+        }
+        self._aead, self._siv = self._keys[self._key_id]
 
-    def _derive_key(self) -> bytes:
+    def _derive_key(self, info: bytes = b"stegano-chacha20-key-derivation", length: int = 32,
+                    master_key: Optional[bytes] = None) -> bytes:
         hkdf = HKDF(
             algorithm=hashes.SHA256(),
-            length=32,
+            length=length,
             salt=str().encode("utf-8"),
-            info=b"stegano-chacha20-key-derivation",
+            info=info,
         )
-        return hkdf.derive(self._master_key)
+        return hkdf.derive(master_key or self._master_key)
+
+    def _keys_for(self, key_id: int) -> _TokenKeys:
+        try:
+            return self._keys[key_id]
+        except KeyError:
+            raise ValueError(f"Unknown key id {key_id}") from None
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _caesar_table(shift: int) -> dict:
+        # str.translate table rotating ALPH by `shift`; other characters are kept
+        shift %= len(ALPH)
+        return str.maketrans(ALPH, ALPH[shift:] + ALPH[:shift])
 
     def _caesar_encode(self, uid: str, shift=5):
-        print("Encoding UID:", uid);
-        return "".join(ALPH[(ALPH.index(c)+shift) % len(ALPH)] if c in ALPH else c for c in uid)
+        return uid.translate(self._caesar_table(shift))
 
     def _caesar_decode(self, enc: str, shift=5):
-        return "".join(ALPH[(ALPH.index(c)-shift) % len(ALPH)] if c in ALPH else c for c in enc)
+        return enc.translate(self._caesar_table(-shift))
 
     def encrypt_for_user(
         self,
         user_id: str | int,
         aad: Optional[str] = None,
-    ) -> str:
-        key = self._derive_key()
-        chacha = ChaCha20Poly1305(key)
+    ) -> bytes:
+        """Compact binary token for `user_id` (see TOKEN_VERSION), embedded as is.
 
-        nonce = os.urandom(12)  # must be unique per (user_id, message)
-        aad_bytes = aad.encode("utf-8") if aad else None
-        message = self._caesar_encode(str(user_id))
-        ciphertext = chacha.encrypt(nonce, message.encode("utf-8"), aad_bytes)
+        22 to 24 bytes with the default nonce, about half the legacy token.
+        """
+        flags = 0
+        plaintext = _varint(int(user_id))
+        if settings.CRYPTO_TOKEN_TIMESTAMP:
+            flags |= FLAG_TIMESTAMP
+            plaintext += _varint(int(time.time()))
+        key_id = b""
+        if self._key_id:
+            # Key id 0 (the original key) is implied when the flag is absent
+            flags |= FLAG_KEY_ID
+            key_id = _varint(self._key_id)
+        nonce = b""
+        if settings.CRYPTO_TOKEN_NONCE:
+            # SIV stays secure if a nonce repeats, the nonce only makes two tokens
+            # of the same user (and timestamp) look different
+            flags |= FLAG_NONCE
+            nonce = os.urandom(TOKEN_NONCE_BYTES)
 
-        # We concatenate nonce + ciphertext (ciphertext already includes Poly1305 tag)
-        combined = nonce + ciphertext
-        return base64.b64encode(combined).decode("utf-8")
+        prefix = bytes([TOKEN_VERSION << 4 | flags]) + key_id + nonce
+        return prefix + self._siv.encrypt(plaintext, self._associated_data(prefix, aad))
+
+    def _associated_data(self, prefix: bytes, aad: Optional[str]) -> List[bytes]:
+        return [prefix, aad.encode("utf-8")] if aad else [prefix]
+
+    def is_compact_token(self, payload: bytes | str) -> bool:
+        return isinstance(payload, (bytes, bytearray)) and len(payload) > 0 \
+            and payload[0] >> 4 == TOKEN_VERSION
+
+    def read_token(
+        self,
+        token: bytes,
+        aad: Optional[str] = None,
+    ) -> SignatureToken:
+        """Authenticate and decode a compact token."""
+        token = bytes(token)
+        if not self.is_compact_token(token):
+            raise ValueError("Not a compact token")
+        flags = token[0] & 0x0F
+        pos, key_id = 1, 0
+        try:
+            if flags & FLAG_KEY_ID:
+                key_id, pos = _read_varint(token, pos)
+            if flags & FLAG_NONCE:
+                pos += TOKEN_NONCE_BYTES
+            if len(token) < pos + 16:
+                raise ValueError("Payload too short")
+        except ValueError as exc:
+            raise ValueError("Invalid token") from exc
+
+        siv = self._keys_for(key_id).siv
+        prefix = token[:pos]
+        try:
+            plaintext = siv.decrypt(token[pos:], self._associated_data(prefix, aad))
+        except InvalidTag as exc:
+            raise ValueError("Authentication failed") from exc
+
+        try:
+            user_id, end = _read_varint(plaintext, 0)
+            issued_at = None
+            if flags & FLAG_TIMESTAMP:
+                issued_at, end = _read_varint(plaintext, end)
+        except ValueError as exc:
+            raise ValueError("Invalid token") from exc
+        return SignatureToken(user_id, issued_at, key_id)
 
     def decrypt_for_user(
         self,
-        payload_b64: str,
+        payload: bytes | str,
         aad: Optional[str] = None,
     ) -> str:
-        key = self._derive_key()
-        chacha = ChaCha20Poly1305(key)
+        """User id carried by a compact token, or by a legacy base64 token."""
+        if self.is_compact_token(payload):
+            return str(self.read_token(payload, aad).user_id)
+        if isinstance(payload, (bytes, bytearray)):
+            try:
+                payload = bytes(payload).decode("ascii")
+            except UnicodeDecodeError as exc:
+                raise ValueError("Invalid base64 payload") from exc
+        return self._decrypt_legacy(payload, aad)
 
+    def _decrypt_legacy(
+        self,
+        payload_b64: str,
+        aad: Optional[str] = None,
+    ) -> str:
         try:
             combined = base64.b64decode(payload_b64)
         except Exception as exc:
@@ -78,16 +256,39 @@ class SteganoCryptoService:
         if len(combined) < 12 + 16:
             raise ValueError("Payload too short")
 
+        # Legacy tokens predate key ids: they were all issued with key 0
+        aead = self._keys_for(0).aead
         nonce = combined[:12]
         ciphertext = combined[12:]
         aad_bytes = aad.encode("utf-8") if aad else None
 
         try:
-            plaintext = chacha.decrypt(nonce, ciphertext, aad_bytes)
+            plaintext = aead.decrypt(nonce, ciphertext, aad_bytes)
             message = self._caesar_decode(plaintext.decode("utf-8"))
         except Exception as exc:
             raise ValueError("Authentication failed") from exc
 
         return message
 
+    def encrypt_many(
+        self,
+        user_ids: Iterable[str | int],
+        aad: Optional[str] = None,
+    ) -> List[bytes]:
+        return [self.encrypt_for_user(user_id, aad) for user_id in user_ids]
+
+    def decrypt_many(
+        self,
+        payloads: Iterable[bytes | str],
+        aad: Optional[str] = None,
+    ) -> List[Optional[str]]:
+        """Decrypt a batch of tokens; an invalid token gives None instead of raising."""
+        messages = []
+        for payload in payloads:
+            try:
+                messages.append(self.decrypt_for_user(payload, aad))
+            except ValueError:
+                messages.append(None)
+        return messages
+
 SteganoCryptoService = SteganoCryptoService()
\ No newline at end of file
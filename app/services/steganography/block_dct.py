@@ -0,0 +1,85 @@
+import numpy as np
+
+BLOCK_SIZE = 8
+# Nombre de lignes de blocs traitées à la fois, pour borner la taille des temporaires
+CHUNK_BLOCK_ROWS = 64
+
+
+def _dct_matrix(n: int = BLOCK_SIZE) -> np.ndarray:
+    # Matrice de la DCT-II orthonormée, identique à celle utilisée par cv2.dct
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    c = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    c[0, :] = np.sqrt(1.0 / n)
+    return c.astype(np.float32)
+
+
+DCT_MATRIX = _dct_matrix()
+IDCT_MATRIX = np.ascontiguousarray(DCT_MATRIX.T)
+
+
+def block_view(plane: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
+    """Return a (block_y, block_x, 8, 8) view over the top-left blocks of `plane`."""
+    region = plane[: block_y * BLOCK_SIZE, : block_x * BLOCK_SIZE]
+    return region.reshape(block_y, BLOCK_SIZE, block_x, BLOCK_SIZE).swapaxes(1, 2)
+
+
+def forward_dct(blocks: np.ndarray) -> np.ndarray:
+    """2D DCT of every 8x8 block of a (..., 8, 8) array, computed as C @ B @ C.T."""
+    return DCT_MATRIX @ blocks @ IDCT_MATRIX
+
+
+def inverse_dct(coefs: np.ndarray) -> np.ndarray:
+    """Inverse of `forward_dct`, computed as C.T @ X @ C."""
+    return IDCT_MATRIX @ coefs @ DCT_MATRIX
+
+
+def quantize(coefs: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return np.around(np.around(coefs) / q)
+
+
+def dequantize(coefs: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return coefs * q
+
+
+class BlockDctEngine:
+    """Batched blockwise DCT + quantization over a whole image plane.
+
+    The plane is processed in-place, a slab of `CHUNK_BLOCK_ROWS` block rows at
+    a time, each slab being transformed with a single matrix product.
+    """
+
+    def __init__(self, q: np.ndarray):
+        self.q = np.asarray(q, dtype=np.float32)
+
+    def _chunks(self, block_y: int):
+        for start in range(0, block_y, CHUNK_BLOCK_ROWS):
+            yield start, min(start + CHUNK_BLOCK_ROWS, block_y)
+
+    def forward(self, plane: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
+        blocks = block_view(plane, block_y, block_x)
+        for start, stop in self._chunks(block_y):
+            blocks[start:stop] = quantize(forward_dct(blocks[start:stop]), self.q)
+        return plane
+
+    def inverse(self, plane: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
+        blocks = block_view(plane, block_y, block_x)
+        for start, stop in self._chunks(block_y):
+            blocks[start:stop] = inverse_dct(dequantize(blocks[start:stop], self.q))
+        return plane
+
+    def iter_forward(self, plane: np.ndarray, block_y: int, block_x: int):
+        """Lazily yield the quantized coefficients of successive block rows.
+
+        Each item is a (rows * 8, block_x * 8) slab in raster layout. The first
+        slab is a single block row and the slab height doubles up to
+        `CHUNK_BLOCK_ROWS`, so a caller that stops early only pays for the top
+        of the plane. `plane` itself is left untouched.
+        """
+        start, step = 0, 1
+        while start < block_y:
+            stop = min(start + step, block_y)
+            blocks = block_view(plane[start * BLOCK_SIZE:stop * BLOCK_SIZE], stop - start, block_x)
+            coefs = quantize(forward_dct(blocks.astype(np.float32)), self.q)
+            yield coefs.swapaxes(1, 2).reshape((stop - start) * BLOCK_SIZE, block_x * BLOCK_SIZE)
+            start, step = stop, min(step * 2, CHUNK_BLOCK_ROWS)
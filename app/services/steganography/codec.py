@@ -0,0 +1,147 @@
+import io
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.core.config import get_settings
+
+# Les images décodées sont des tableaux uint8 (h, w, 3) contigus, canaux dans
+# l'ordre d'OpenCV (BGR)
+BLUE, GREEN, RED = 0, 1, 2
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "tiff": "image/tiff",
+}
+
+_PNG_FAST = {cv2.IMWRITE_PNG_COMPRESSION: 1, cv2.IMWRITE_PNG_STRATEGY: cv2.IMWRITE_PNG_STRATEGY_RLE}
+_JPEG = {cv2.IMWRITE_JPEG_QUALITY: 95, cv2.IMWRITE_JPEG_SAMPLING_FACTOR: cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420}
+# WebP toujours sans perte (qualité > 100) : les messages cachés y survivent
+_WEBP = {cv2.IMWRITE_WEBP_QUALITY: 101}
+
+# Profils de sortie (STEGANO_OUTPUT_PROFILE). Ils ne changent que le niveau de
+# compression sans perte (zlib pour PNG, tables de Huffman optimisées/progressif
+# pour JPEG), jamais les pixels ni la quantification JPEG : un message caché
+# survit de la même façon quel que soit le profil. La taille décroît de fast à
+# smallest, sur photo comme sur aplats. Mesures PNG (bench_steganography
+# --suite encode, 12 MP, photo bruitée / aplats) :
+#   fast     : zlib niveau 1 en RLE          0.77 s 26.95 Mo /  0.78 s 5.31 Mo
+#   balanced : zlib niveau 6, filtré         1.96 s 26.95 Mo /  1.36 s 2.22 Mo
+#   smallest : zlib niveau 9, filtré         1.92 s 26.95 Mo / 13.2 s  1.36 Mo
+# Sur une photo, le RLE est aussi compact que les niveaux élevés (le bruit ne se
+# compresse pas) : balanced/smallest ne gagnent que sur les aplats. En dessous du
+# niveau 6, la stratégie par défaut ou filtrée donne une photo plus grosse
+# (28.00 Mo) que le RLE. OpenCV remet la stratégie par défaut quand il lit le
+# niveau de compression : le niveau doit précéder la stratégie dans les drapeaux.
+ENCODE_PROFILES: Dict[str, Dict[str, Dict[int, int]]] = {
+    "fast": {
+        "png": _PNG_FAST,
+        "jpeg": _JPEG,
+        "webp": _WEBP,
+    },
+    "balanced": {
+        "png": {cv2.IMWRITE_PNG_COMPRESSION: 6, cv2.IMWRITE_PNG_STRATEGY: cv2.IMWRITE_PNG_STRATEGY_FILTERED},
+        "jpeg": {**_JPEG, cv2.IMWRITE_JPEG_OPTIMIZE: 1},
+        "webp": _WEBP,
+    },
+    "smallest": {
+        "png": {cv2.IMWRITE_PNG_COMPRESSION: 9, cv2.IMWRITE_PNG_STRATEGY: cv2.IMWRITE_PNG_STRATEGY_FILTERED},
+        "jpeg": {**_JPEG, cv2.IMWRITE_JPEG_OPTIMIZE: 1, cv2.IMWRITE_JPEG_PROGRESSIVE: 1},
+        "webp": _WEBP,
+    },
+}
+for _profile in ENCODE_PROFILES.values():
+    _profile["jpg"] = _profile["jpeg"]
+
+
+def normalize_format(format_output: Optional[str]) -> str:
+    return (format_output or "png").lower().lstrip('.')
+
+
+def encode_params(fmt: str, profile: Optional[str] = None,
+                  overrides: Optional[Dict[int, int]] = None) -> List[int]:
+    """cv2.imencode flags of `fmt` for `profile` (STEGANO_OUTPUT_PROFILE by default).
+
+    `overrides` is merged on top, e.g. an engine that needs a given JPEG quality.
+    """
+    profile = (profile or get_settings().STEGANO_OUTPUT_PROFILE).lower()
+    if profile not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown output profile: {profile}")
+    flags = {**ENCODE_PROFILES[profile].get(fmt, {}), **(overrides or {})}
+    return [value for flag in flags.items() for value in flag]
+
+
+def decode(image_bytes) -> np.ndarray:
+    """Decode an encoded image (bytes or any buffer, e.g. a memoryview) to BGR uint8."""
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Impossible de décoder l'image")
+    return img
+
+
+def image_shape(source) -> Tuple[int, int, int]:
+    """(h, w, 3) of an encoded image, read from its header without decoding the pixels.
+
+    `source` is the encoded image (bytes) or a seekable file, e.g. an upload's
+    spooled file, which is rewound afterwards.
+    """
+    stream = source if hasattr(source, "read") else io.BytesIO(source)
+    try:
+        with Image.open(stream) as img:
+            w, h = img.size
+    except Exception:
+        raise ValueError("Impossible de décoder l'image")
+    finally:
+        if stream is source:
+            source.seek(0)
+    return h, w, 3
+
+
+def encode(image: np.ndarray, format_output: str, overrides: Optional[Dict[int, int]] = None,
+           profile: Optional[str] = None) -> np.ndarray:
+    """Encode a BGR image; the result is the 1-D uint8 buffer written by OpenCV."""
+    fmt = normalize_format(format_output)
+    success, buf = cv2.imencode(f".{fmt}", image, encode_params(fmt, profile, overrides))
+    if not success:
+        raise ValueError("Erreur lors de l'encodage de l'image stégo")
+    return buf.reshape(-1)
+
+
+def channel(image: np.ndarray, index: int) -> np.ndarray:
+    """(h, w) view on one channel; writing to it modifies `image`."""
+    return image[:, :, index]
+
+
+def green(image: np.ndarray) -> np.ndarray:
+    return channel(image, GREEN)
+
+
+def blue(image: np.ndarray) -> np.ndarray:
+    return channel(image, BLUE)
+
+
+def to_yuv(image: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """YUV conversion of rows [start, stop) only.
+
+    Y is a weighted sum of the three channels and can't be a view: callers
+    convert just the rows they read or modify, and write them back with
+    `from_yuv`.
+    """
+    return cv2.cvtColor(image[start:stop], cv2.COLOR_BGR2YUV)
+
+
+def from_yuv(image: np.ndarray, yuv: np.ndarray, start: int = 0) -> np.ndarray:
+    """Write YUV rows produced by `to_yuv` back into `image`, from row `start`."""
+    image[start:start + yuv.shape[0]] = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
+    return image
+
+
+def luma(image: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """Y plane of rows [start, stop)."""
+    return to_yuv(image, start, stop)[:, :, 0]
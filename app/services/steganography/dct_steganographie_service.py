@@ -1,72 +1,170 @@
 import fastapi
 import numpy as np
-import cv2
+
+from app.services.steganography import codec, tiles
+from app.services.steganography.block_dct import CHUNK_BLOCK_ROWS, DCT_MATRIX, block_view
+
+# Fonction de base 8x8 du coefficient DCT (5, 2) qui porte les bits
+DCT_BASIS = np.outer(DCT_MATRIX[5], DCT_MATRIX[2])
+# Le message se termine au premier octet nul. Un message binaire est donc codé
+# en COBS (sans octet nul) derrière l'octet 0xFF, qui ne commence jamais un texte UTF-8
+BINARY_MARKER = 0xFF
+
+
+def cobs_encode(data: bytes) -> bytes:
+    """Consistent Overhead Byte Stuffing: `data` without any zero byte (+1 byte / 254)."""
+    out = bytearray([0])
+    code_pos, code = 0, 1
+    for byte in data:
+        if byte:
+            out.append(byte)
+            code += 1
+        if not byte or code == 0xFF:
+            out[code_pos] = code
+            code_pos, code = len(out), 1
+            out.append(0)
+    out[code_pos] = code
+    return bytes(out)
+
+
+def cobs_decode(data: bytes) -> bytes:
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        code = data[pos]
+        if code == 0 or pos + code > len(data):
+            raise ValueError("Invalid COBS data")
+        out += data[pos + 1:pos + code]
+        pos += code
+        if code < 0xFF and pos < len(data):
+            out.append(0)
+    return bytes(out)
 
 
 class DctSteganographieService:
     def text_to_bits(self, text):
-        return [int(b) for b in ''.join(f'{c:08b}' for c in (text + '\0').encode('utf-8'))]
+        # Texte (UTF-8) ou octets, suivi de l'octet nul de fin
+        if isinstance(text, str):
+            data = text.encode('utf-8')
+        else:
+            data = bytes([BINARY_MARKER]) + cobs_encode(bytes(text))
+        return np.unpackbits(np.frombuffer(data + b'\0', dtype=np.uint8))
 
     def bits_to_text(self, bits):
-        bits = bits[:-8]
-        bytes_list = [bits[i:i + 8] for i in range(0, len(bits), 8)]
-        return ''.join(chr(int(''.join(map(str, byte)), 2)) for byte in bytes_list)
-
-    def _embed_dct(self, img, message, strength=35):
+        bits = np.asarray(bits, dtype=np.uint8)
+        data = np.packbits(bits[:bits.size // 8 * 8]).tobytes()
+        return data.split(b'\0', 1)[0].decode('utf-8', errors='ignore')
+
+    def _grid(self, h, w):
+        # Blocs 8x8 parcourus : range(0, h - 8, 8) x range(0, w - 8, 8)
+        return len(range(0, h - 8, 8)), len(range(0, w - 8, 8))
+
+    def capacity(self, h, w, binary=False):
+        # Un bit par bloc, le message est suivi d'un octet nul ; un message binaire
+        # coûte en plus le marqueur et le surcoût COBS (1 octet, +1 par 254)
+        block_y, block_x = self._grid(h, w)
+        size = block_y * block_x // 8 - 1
+        if binary:
+            size -= 2
+            size -= (size + 1) // 255
+        return max(0, size)
+
+    def _coefficients(self, blocks):
+        # Coefficient (5, 2) de chaque bloc, par projection sur la fonction de base
+        return np.einsum("...ij,ij->...", blocks, DCT_BASIS)
+
+    def _embed_dct(self, img, message, strength=35, out=None, tile_key=None):
         bits = self.text_to_bits(message)
         h, w = img.shape[:2]
+        block_y, block_x = self._grid(h, w)
+        if bits.size > block_y * block_x:
+            raise ValueError("Capacité insuffisante pour cacher le message.")
+        n = bits.size
+        # Copie de l'image par défaut, ou écriture dans `out` (ex. l'image elle-même)
+        if out is None:
+            stego = img.copy()
+        else:
+            stego = out
+            if stego is not img:
+                stego[...] = img
+        if n == 0:
+            return stego
+
+        # Seules les lignes de blocs qui portent des bits sont converties et modifiées,
+        # prises bande par bande dans l'ordre donné par `tile_key`
+        rows = -(-n // block_x)
+        spans = tiles.truncate(tiles.tile_spans(block_y * 8, tile_key), rows * 8)
+        carrier = tiles.gather(stego, spans)
+        yuv = codec.to_yuv(carrier)
+        view = block_view(yuv[:, :, 0], rows, block_x)
+        blocks = view.reshape(-1, 8, 8)
+        carriers = blocks[:n].astype(np.float32)
+
+        # Fixer le coefficient (5, 2) à +/-strength revient à ajouter la fonction de
+        # base pondérée par l'écart, directement dans le domaine spatial
+        target = np.where(bits[:n] == 1, strength, -strength)
+        carriers += (target - self._coefficients(carriers))[:, None, None] * DCT_BASIS
+        blocks[:n] = np.clip(np.round(carriers), 0, 255)
+        view[...] = blocks.reshape(view.shape)
+
+        return tiles.scatter(stego, codec.from_yuv(carrier, yuv), spans)
+
+    def _row_slabs(self, block_y, tile_key=None):
+        # Lignes de blocs [start, stop) dans l'ordre de lecture : tranches de 1, 2,
+        # 4, ... lignes de blocs, ou bande par bande si l'ordre est tiré d'une clé
+        if tile_key is not None:
+            for start, stop in tiles.tile_spans(block_y * 8, tile_key):
+                yield start // 8, stop // 8
+            return
+        start, step = 0, 1
+        while start < block_y:
+            stop = min(start + step, block_y)
+            yield start, stop
+            start, step = stop, min(step * 2, CHUNK_BLOCK_ROWS)
+
+    def _extract_raw(self, stegano_img, tile_key=None):
+        block_y, block_x = self._grid(*stegano_img.shape[:2])
+        data = bytearray()
+        pending = np.empty(0, dtype=np.uint8)
+        # Lecture par tranches de lignes de blocs jusqu'au premier octet nul :
+        # un message court ne parcourt que le haut de l'image (ou ses premières bandes)
+        for start, stop in self._row_slabs(block_y, tile_key):
+            Y = codec.luma(stegano_img, start * 8, stop * 8)
+            blocks = block_view(Y, stop - start, block_x).astype(np.float32)
+            bits = np.concatenate([pending, (self._coefficients(blocks).ravel() > 0).astype(np.uint8)])
+            full = bits.size // 8 * 8
+            chunk = np.packbits(bits[:full])
+            pending = bits[full:]
+            nul = np.flatnonzero(chunk == 0)
+            if nul.size:
+                data += chunk[:nul[0]].tobytes()
+                break
+            data += chunk.tobytes()
+        return bytes(data)
+
+    def _extract_dct(self, stegano_img, strength=35, tile_key=None):
+        return self._extract_raw(stegano_img, tile_key).decode('utf-8', errors='ignore')
+
+    def extract_bytes(self, stegano_img, tile_key=None) -> bytes:
+        """Message as bytes: a binary message is un-stuffed, a text is returned encoded."""
+        data = self._extract_raw(stegano_img, tile_key)
+        if data[:1] == bytes([BINARY_MARKER]):
+            return cobs_decode(data[1:])
+        return data
+    
+    def embed_dct(self, img, message, strength=35, out=None, tile_key=None):
+        return self._embed_dct(img, message, strength, out, tile_key)
 
-        yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
-        Y = yuv[:, :, 0].astype(np.float32)
-        idx = 0
-
-        for i in range(0, h - 8, 8):
-            for j in range(0, w - 8, 8):
-                if idx >= len(bits):
-                    yuv[:, :, 0] = np.clip(np.round(Y), 0, 255).astype(np.uint8)
-                    return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
-
-                block = Y[i:i + 8, j:j + 8]
-                dct = cv2.dct(block)
-
-                dct[5, 2] = strength if bits[idx] else -strength
-
-                Y[i:i + 8, j:j + 8] = cv2.idct(dct)
-                idx += 1
-
-        yuv[:, :, 0] = np.clip(np.round(Y), 0, 255).astype(np.uint8)
-        return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
-
-    def _extract_dct(self, stegano_img, strength=35):
-        yuv = cv2.cvtColor(stegano_img, cv2.COLOR_BGR2YUV)
-        Y = yuv[:, :, 0].astype(np.float32)
-        bits = []
-
-        for i in range(0, Y.shape[0] - 8, 8):
-            for j in range(0, Y.shape[1] - 8, 8):
-                block = Y[i:i + 8, j:j + 8]
-                dct = cv2.dct(block)
-                val = dct[5, 2]
-                bit = 1 if val > 0 else 0
-                bits.append(bit)
-
-                if len(bits) >= 8 and bits[-8:] == [0] * 8:
-                    return self.bits_to_text(bits)
+    def extract_dct(self, stegano_img, strength=35, tile_key=None):
+        return self._extract_dct(stegano_img, strength, tile_key)
 
-        return self.bits_to_text(bits)
-    
     def hideSecretMessageInImage(self, image_bytes: bytes, secret_message: str,format_output: str) -> bytes:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = codec.decode(image_bytes)
         stego_img = self._embed_dct(img, secret_message)
-        output_ext = (format_output or "png").lower().lstrip('.')
-        ext = f".{output_ext}"
-        success, buf = cv2.imencode(ext, stego_img)
-        return buf.tobytes()
+        return codec.encode(stego_img, format_output).tobytes()
     
     def extractSecretMessageFromImage(self, image_bytes: bytes):
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = codec.decode(image_bytes)
         return self._extract_dct(img)
 
 
@@ -1,7 +1,24 @@
 import cv2
 import numpy as np
-from PIL import Image
-import io
+
+from app.services.steganography import codec, tiles
+from app.services.steganography.block_dct import BlockDctEngine
+
+# Code de Hamming (1,15,4) : 4 bits cachés par groupe de 15 coefficients non nuls
+GROUP_SIZE = 15
+GROUP_BITS = 4
+SYNDROME_WEIGHTS = np.array([8, 4, 2, 1])
+# Longueur du message (en bits) codée sur 12 bits en tête
+LENGTH_BITS = 12
+LENGTH_WEIGHTS = 1 << np.arange(LENGTH_BITS - 1, -1, -1)
+# Nombre de groupes traités par passe vectorisée entre deux rétrécissements
+EMBED_WINDOW = 64
+# Le message (en bits) doit tenir dans l'en-tête de 12 bits
+MAX_MESSAGE_BYTES = ((1 << LENGTH_BITS) - 1) // 8
+# Le message doit survivre à la recompression : JPEG sans perte de qualité ni
+# sous-échantillonnage de la chrominance (le reste vient du profil de sortie)
+JPEG_PARAMS = {cv2.IMWRITE_JPEG_QUALITY: 100,
+               cv2.IMWRITE_JPEG_SAMPLING_FACTOR: cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444}
 
 class F5SteganographyService:
     def __init__(self):
@@ -25,198 +42,223 @@ class F5SteganographyService:
                 [1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1],
             ]
         )
+        self._blocks = BlockDctEngine(self.Q)
 
     def hideSecretMessageInImage(self, image_bytes: bytes, secret_message: str,formatOutupt: str) -> bytes:
         print(f"secret : {secret_message} , format {formatOutupt}")
-        image = self._imageBytesToImageImage(image_bytes)
+        image = codec.decode(image_bytes)
         print("imagge  ")
-        stego_image = self._encode(image, secret_message)
-        return self._imageImageTobytes(stego_image,formatOutupt)
+        stego_image = self.embed_image(image, secret_message)
+        return codec.encode(stego_image, formatOutupt, self.encode_params(formatOutupt)).tobytes()
 
     def extractSecretMessageFromImage(self, image_bytes: bytes) -> str:
-        image = self._imageBytesToImageImage(image_bytes)
-        secret_message = self._decode(image)
+        image = codec.decode(image_bytes)
+        secret_message = self.extract_plane(codec.green(image))
         return secret_message
-    
-    def _imageImageTobytes(self, image: Image.Image, formatOutupt: str) -> bytes:
-        out_stream = io.BytesIO()
-        formatOutupt = formatOutupt.lower()
-        if formatOutupt == "jpg" or formatOutupt == "jpeg":
-            image.save(out_stream, quality=100, subsampling=0,format=formatOutupt)
-        else:
-            image.save(out_stream,format=formatOutupt)
-        return out_stream.getvalue()
-
-    def _imageBytesToImageImage(self,image_bytes: bytes)->Image.Image:
-        image_stream = io.BytesIO(image_bytes)
-        image = Image.open(image_stream).convert("RGB")
-        return image
 
-    
+    def encode_params(self, formatOutupt: str):
+        if codec.normalize_format(formatOutupt) in ("jpg", "jpeg"):
+            return JPEG_PARAMS
+        return None
+
     def _dct(self, before: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
-        # Calcul de la DCT et la quantification sur chaque matrice 8x8 de l’image
-        for i in range(block_y):
-            for j in range(block_x):
-                start_y, end_y = 8 * i, 8 * (i + 1)
-                start_x, end_x = 8 * j, 8 * (j + 1)
-                block = before[start_y:end_y, start_x:end_x]
-                dct_block = cv2.dct(block)
-                dct_block = np.around(dct_block)
-                quant_block = np.divide(dct_block, self.Q)
-                before[start_y:end_y, start_x:end_x] = np.around(quant_block)
-        return before
+        # Calcul de la DCT et la quantification de toutes les matrices 8x8 de l’image
+        return self._blocks.forward(before, block_y, block_x)
 
     def _idct(self, before: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
-        # Déquantification et l’IDCT sur chaque matrice 8x8 de l’image.
-        for i in range(block_y):
-            for j in range(block_x):
-              start_y, end_y = 8 * i, 8 * (i + 1)
-              start_x, end_x = 8 * j, 8 * (j + 1)
-              block = before[start_y:end_y, start_x:end_x]
-              dequant_block = np.multiply(block, self.Q)
-              idct_block = cv2.idct(dequant_block)
-              before[start_y:end_y, start_x:end_x] = idct_block
-        return before
-        
-
-    def _encode(self, image_original: Image.Image, secret_message: str) -> Image.Image:
-        img = np.array(image_original)
-        img1 = img[:, :, 1]
-        h, w = img1.shape
-        img1 = img1.astype(np.float32)
-        d = img1
-        block_y = h // 8
-        block_x = w // 8
-        d = self._dct(d, block_y, block_x)
-        byte_s = secret_message.encode("utf-8")
-        hex_bin = byte_s.hex()
-        oct_bin = oct(int(hex_bin, 16))
-        binary_bin = bin(int(oct_bin, 8))[2:].zfill(len(hex_bin) * 4)
-        lenth_bin = bin(len(binary_bin))[2:].zfill(12)
-        binary_bin = lenth_bin + binary_bin
-        data_lenth = len(binary_bin)
-        stego = d
-        num = 0
-        a = np.zeros((15, 1))
-        k = 0
-        sit = np.zeros((15, 2))
-        for i in range(block_y * 8):
-            for j in range(block_x * 8):
-                if (d[i, j] > 0 and (d[i, j] % 2) == 1) or (
-                    d[i, j] < 0 and (d[i, j] % 2) == 0
-                ):
-                    a[k] = 1
-                    sit[k][0] = i
-                    sit[k][1] = j
-                    k = k + 1
-                elif (d[i, j] < 0 and (d[i, j] % 2) == 1) or (
-                    d[i, j] > 0 and (d[i, j] % 2) == 0
-                ):
-                    a[k] = 0
-                    sit[k][0] = i
-                    sit[k][1] = j
-                    k = k + 1
-                if k >= 15:
-                    data_bit = np.zeros((4, 1))
-                    data_bit[0][0] = binary_bin[num]
-                    num = num + 1
-                    data_bit[1][0] = binary_bin[num]
-                    num = num + 1
-                    data_bit[2][0] = binary_bin[num]
-                    num = num + 1
-                    data_bit[3][0] = binary_bin[num]
-                    temp = np.dot(self.M, a)
-                    temp = temp % 2
-                    ntemp = np.logical_xor(data_bit, temp)
-                    n = (
-                        ntemp[0][0] * 8
-                        + ntemp[1][0] * 4
-                        + ntemp[2][0] * 2
-                        + ntemp[3][0]
-                        - 1
-                    )
-                    if n >= 0:
-                        if d[int(sit[n][0])][int(sit[n][1])] < 0:
-                            stego[int(sit[n][0])][int(sit[n][1])] = (
-                                d[int(sit[n][0])][int(sit[n][1])] + 1
-                            )
-                        elif d[int(sit[n][0])][int(sit[n][1])] > 0:
-                            stego[int(sit[n][0])][int(sit[n][1])] = (
-                                d[int(sit[n][0])][int(sit[n][1])] - 1
-                            )
-                        if stego[int(sit[n][0])][int(sit[n][1])] == 0:
-                            k = k - 1
-                            if n < 14:
-                                sit[n:k, :] = sit[n + 1 : k + 1, :]
-                                a[n:k] = a[n + 1 : k + 1]
-                            if n == 14:
-                                ...
-                            num = num - 3
-                            continue
-                    num = num + 1
-                    k = 0
-                if num >= data_lenth:
-                    break
-            if num >= data_lenth:
+        # Déquantification et l’IDCT de toutes les matrices 8x8 de l’image.
+        return self._blocks.inverse(before, block_y, block_x)
+
+    def _message_bits(self, secret_message) -> np.ndarray:
+        # En-tête de 12 bits (longueur du message en bits) suivi des bits du message
+        # (texte encodé en UTF-8, ou octets tels quels)
+        if isinstance(secret_message, str):
+            secret_message = secret_message.encode("utf-8")
+        payload = np.unpackbits(np.frombuffer(bytes(secret_message), dtype=np.uint8))
+        if payload.size >= 1 << LENGTH_BITS:
+            raise ValueError("Message trop long pour l'en-tête F5 (12 bits).")
+        header = (payload.size >> np.arange(LENGTH_BITS - 1, -1, -1)) & 1
+        return np.concatenate([header.astype(np.uint8), payload])
+
+    def _parity(self, coefs: np.ndarray) -> np.ndarray:
+        # Bit porté par un coefficient non nul : parité de |c|, inversée si c < 0
+        return (np.abs(coefs) % 2 == 1) ^ (coefs < 0)
+
+    def _syndromes(self, group_bits: np.ndarray) -> np.ndarray:
+        # Syndrome (1,15,4) de chaque groupe de 15 bits, sous forme d'entier 0..15
+        return ((group_bits @ self.M.T) % 2) @ SYNDROME_WEIGHTS
+
+    def _embed(self, d: np.ndarray, block_y: int, block_x: int, bits: np.ndarray) -> np.ndarray:
+        region = d[: block_y * 8, : block_x * 8]
+        width = region.shape[1]
+        # Indices (ordre de balayage ligne par ligne) des coefficients non nuls utilisables
+        usable = np.flatnonzero(region)
+        symbols = bits.reshape(-1, GROUP_BITS) @ SYNDROME_WEIGHTS
+        g = pos = 0
+        while g < symbols.size:
+            count = min(symbols.size - g, EMBED_WINDOW)
+            if pos + count * GROUP_SIZE > usable.size:
+                raise ValueError("Capacité insuffisante pour cacher le message.")
+            rows, cols = np.divmod(usable[pos:pos + count * GROUP_SIZE].reshape(count, GROUP_SIZE), width)
+            vals = region[rows, cols]
+            n = symbols[g:g + count] ^ self._syndromes(self._parity(vals))
+            col = np.maximum(n - 1, 0)
+            changed = n > 0
+            shrink = changed & (np.abs(vals[np.arange(count), col]) == 1)
+            first = int(np.argmax(shrink)) if shrink.any() else count
+
+            # Tous les groupes avant le premier rétrécissement sont modifiés en une fois
+            sel = np.flatnonzero(changed[:first])
+            r, c = rows[sel, col[sel]], cols[sel, col[sel]]
+            region[r, c] -= np.sign(region[r, c])
+            g += first
+            pos += first * GROUP_SIZE
+
+            if first < count:
+                pos = self._embed_shrinking_group(region, usable, pos, symbols[g])
+                g += 1
+        return d
+
+    def _embed_shrinking_group(self, region: np.ndarray, usable: np.ndarray, pos: int, symbol: int) -> int:
+        # Cas du rétrécissement : le coefficient passé à 0 sort du groupe, le suivant
+        # le remplace et le même symbole est réinséré. Retourne la position suivante.
+        width = region.shape[1]
+        group = list(usable[pos:pos + GROUP_SIZE])
+        nxt = pos + GROUP_SIZE
+        while True:
+            rows, cols = np.divmod(np.array(group), width)
+            n = symbol ^ int(self._syndromes(self._parity(region[rows, cols])))
+            if n == 0:
+                return nxt
+            r, c = rows[n - 1], cols[n - 1]
+            region[r, c] -= np.sign(region[r, c])
+            if region[r, c] != 0:
+                return nxt
+            if nxt >= usable.size:
+                raise ValueError("Capacité insuffisante pour cacher le message.")
+            group.pop(n - 1)
+            group.append(usable[nxt])
+            nxt += 1
+
+    def embed_image(self, image: np.ndarray, secret_message, tile_key: bytes = None) -> np.ndarray:
+        """Hide `secret_message` in the green channel of a decoded BGR image, in place."""
+        green = codec.green(image)
+        self.embed_plane(green, secret_message, out=green, tile_key=tile_key)
+        return image
+
+    def embed_plane(self, green: np.ndarray, secret_message, out: np.ndarray = None,
+                    tile_key: bytes = None) -> np.ndarray:
+        """Hide `secret_message` in a uint8 green plane; the result is written to `out`
+        (a copy of the plane by default, or e.g. the green channel view of the decoded image).
+
+        Only the bands (see `tiles`) needed to hold the message are transformed,
+        in the order given by `tile_key`; the other rows are left untouched.
+        """
+        bits = self._message_bits(secret_message)
+        if out is None:
+            out = green.copy()
+        elif out is not green:
+            out[...] = green
+        block_x = green.shape[1] // 8
+        spans = tiles.tile_spans(green.shape[0] // 8 * 8, tile_key)
+        # Une bande suffit en général pour un jeton ; sinon on double le nombre de
+        # bandes et on recommence (sur les pixels d'origine, `green` est intact)
+        count = 1
+        while True:
+            used = spans[:count]
+            try:
+                if not used:
+                    raise ValueError("Capacité insuffisante pour cacher le message.")
+                stacked = tiles.gather(green, used).astype(np.float32)
+                block_y = stacked.shape[0] // 8
+                d = self._dct(stacked, block_y, block_x)
+                stego = self._idct(self._embed(d, block_y, block_x, bits), block_y, block_x)
                 break
-        stego = self._idct(stego, block_y, block_x)
-        for i in range(h):
-            for j in range(w):
-                if stego[i][j] > 255:
-                    stego[i][j] = 255
-                if stego[i][j] < 0:
-                    stego[i][j] = 0
-        stego = np.round(stego)
-        stego = np.uint8(stego)
-        img[:, :, 1] = stego
-        new_img = Image.fromarray(np.uint8(img))
-        return new_img
-
-    def _decode(self, image_original: Image.Image) -> str:
-        img = np.array(image_original)
-        img1 = img[:, :, 1]
-        data_lenth = 100
-        extract = ""
-        h, w = img1.shape
-        d = np.zeros(img1.shape)
-        block_y = h // 8
-        block_x = w // 8
-        img1 = img1.astype(np.float32)
-        d = self._dct(img1, block_y, block_x)
-        num = 0
-        a = np.zeros((15, 1))
-        k = 0
-        for i in range(block_y * 8):
-            for j in range(block_x * 8):
-                if (d[i, j] > 0 and (d[i, j] % 2) == 1) or (
-                    d[i, j] < 0 and (d[i, j] % 2) == 0
-                ):
-                    a[k] = 1
-                    k = k + 1
-                elif (d[i, j] < 0 and (d[i, j] % 2) == 1) or (
-                    d[i, j] > 0 and (d[i, j] % 2) == 0
-                ):
-                    a[k] = 0
-                    k = k + 1
-                if k >= 15:
-                    temp = np.dot(self.M, a)
-                    temp = temp % 2
-                    extract += str(int(temp[0][0]))
-                    extract += str(int(temp[1][0]))
-                    extract += str(int(temp[2][0]))
-                    extract += str(int(temp[3][0]))
-                    num = num + 4
-                    if num == 12:
-                        data_lenth = int(extract[:12], 2) + 12
-                    k = 0
-                if num >= data_lenth:
-                    break
-            if num >= data_lenth:
+            except ValueError:
+                if count >= len(spans):
+                    raise
+                count *= 2
+        # Écrêtage, arrondi et conversion en uint8 en une seule passe
+        stacked_out = np.empty(stego.shape, dtype=np.uint8)
+        np.rint(np.clip(stego, 0, 255, out=stego), out=stacked_out, casting="unsafe")
+        return tiles.scatter(out, stacked_out, used)
+
+    def _slabs(self, img1: np.ndarray, tile_key: bytes = None):
+        # Coefficients quantifiés dans l'ordre d'insertion : ligne de blocs par ligne
+        # de blocs, bande par bande si l'ordre des bandes est tiré d'une clé
+        block_y, block_x = img1.shape[0] // 8, img1.shape[1] // 8
+        if tile_key is None:
+            yield from self._blocks.iter_forward(img1, block_y, block_x)
+            return
+        for start, stop in tiles.tile_spans(block_y * 8, tile_key):
+            yield from self._blocks.iter_forward(img1[start:stop], (stop - start) // 8, block_x)
+
+    def _extract_bits(self, coefs: np.ndarray, n_bits: int) -> np.ndarray:
+        # Syndromes de tous les groupes complets d'un coup, 4 bits par groupe
+        groups = min(-(-n_bits // GROUP_BITS), coefs.size // GROUP_SIZE)
+        synd = self._syndromes(self._parity(coefs[:groups * GROUP_SIZE].reshape(groups, GROUP_SIZE)))
+        return ((synd[:, None] >> np.arange(GROUP_BITS - 1, -1, -1)) & 1).ravel()[:n_bits]
+
+    def _read_bits(self, img1: np.ndarray, header_only: bool = False, tile_key: bytes = None):
+        # Les blocs ne sont transformés qu'au fur et à mesure : d'abord de quoi lire
+        # l'en-tête de 12 bits, puis juste assez pour couvrir le message annoncé.
+        chunks, count = [], 0
+        n_bits, header_read = LENGTH_BITS, False
+        for slab in self._slabs(img1, tile_key):
+            chunks.append(slab[slab != 0])
+            count += chunks[-1].size
+            if not header_read and count >= -(-LENGTH_BITS // GROUP_BITS) * GROUP_SIZE:
+                header = self._extract_bits(np.concatenate(chunks), LENGTH_BITS)
+                if header_only:
+                    return header
+                n_bits += int(header @ LENGTH_WEIGHTS)
+                header_read = True
+            if header_read and count >= -(-n_bits // GROUP_BITS) * GROUP_SIZE:
                 break
-        val = hex(int(extract[12:], 2))[2:] 
-        val = val.zfill(len(val) + len(val) % 2) 
-        message =bytes.fromhex(val).decode('utf-8', errors='ignore')
-        print(message)
-        return message
+        if not header_read:
+            return None
+        return self._extract_bits(np.concatenate(chunks), n_bits)
+
+    def capacity_bytes(self, nonzero: int, ones: int = 0) -> int:
+        # Taille maximale du message pour `nonzero` coefficients non nuls dont
+        # `ones` valent +/-1. Chaque rétrécissement (un +/-1 modifié passe à 0)
+        # perd un coefficient, et un coefficient ne rétrécit qu'une fois : en
+        # retirant tous les +/-1 la taille est garantie. Avec ones=0, borne haute.
+        bits = (nonzero - ones) // GROUP_SIZE * GROUP_BITS - LENGTH_BITS
+        return max(0, min(bits // 8, MAX_MESSAGE_BYTES))
+
+    def capacity_bounds(self, img1: np.ndarray, tile_key: bytes = None):
+        """(taille garantie, borne haute) du message, en octets, pour ce plan vert.
+
+        Entre les deux, le message tient ou non selon les rétrécissements. Les
+        coefficients ne sont comptés que jusqu'à la limite de l'en-tête de 12 bits,
+        seules les premières lignes de blocs sont transformées.
+        """
+        limit = -(-(MAX_MESSAGE_BYTES * 8 + LENGTH_BITS) // GROUP_BITS) * GROUP_SIZE
+        nonzero = ones = 0
+        for slab in self._slabs(img1, tile_key):
+            nonzero += np.count_nonzero(slab)
+            ones += np.count_nonzero(np.abs(slab) == 1)
+            if nonzero - ones >= limit:
+                break
+        return self.capacity_bytes(nonzero, ones), self.capacity_bytes(nonzero)
+
+    def capacity(self, img1: np.ndarray, tile_key: bytes = None) -> int:
+        """Taille (en octets) d'un message qui tient à coup sûr dans ce plan vert."""
+        return self.capacity_bounds(img1, tile_key)[0]
+
+    def payload_length(self, img1: np.ndarray, tile_key: bytes = None):
+        """Longueur du message (en bits) annoncée par l'en-tête, sans lire le message."""
+        header = self._read_bits(img1, header_only=True, tile_key=tile_key)
+        return None if header is None else int(header @ LENGTH_WEIGHTS)
+
+    def extract_bytes(self, img1: np.ndarray, tile_key: bytes = None) -> bytes:
+        bits = self._read_bits(img1, tile_key=tile_key)
+        if bits is None:
+            return b""
+        return np.packbits(bits[LENGTH_BITS:]).tobytes()
+
+    def extract_plane(self, img1: np.ndarray, tile_key: bytes = None) -> str:
+        return self.extract_bytes(img1, tile_key).decode("utf-8", errors="ignore")
 
 F5_stegano = F5SteganographyService()
\ No newline at end of file
@@ -1,75 +1,79 @@
-from PIL import Image
-import cv2
+import struct
+import zlib
 import numpy as np
 
+from app.services.steganography import codec
+
+# Binary payload format, version 1:
+#   magic (4 bytes) | version (1) | flags (1) | length (4, big endian) | data | [crc32 (4)]
+PAYLOAD_MAGIC = b"LSBS"
+PAYLOAD_VERSION = 1
+PAYLOAD_HEADER = struct.Struct(">4sBBI")
+FLAG_CRC32 = 0x01
+
 class SteganographyException(Exception):
     pass
 
 class LSBSteg():
     def __init__(self, im):
-        self.image = im
+        self.image = np.ascontiguousarray(im)
         self.height, self.width, self.nbchannels = im.shape
         self.size = self.width * self.height
-        
-        self.maskONEValues = [1,2,4,8,16,32,64,128]
-        #Mask used to put one ex:1->00000001, 2->00000010 .. associated with OR bitwise
-        self.maskONE = self.maskONEValues.pop(0) #Will be used to do bitwise operations
-        
-        self.maskZEROValues = [254,253,251,247,239,223,191,127]
-        #Mak used to put zero ex:254->11111110, 253->11111101 .. associated with AND bitwise
-        self.maskZERO = self.maskZEROValues.pop(0)
-        
-        self.curwidth = 0  # Current width position
-        self.curheight = 0 # Current height position
-        self.curchan = 0   # Current channel position
+        self.slots = self.size * self.nbchannels
+
+        # Index of the next slot to read or write. Slots follow the flattened
+        # (height, width, channel) layout; once the image is full the next bit
+        # plane is used (1 -> 00000001, then 2 -> 00000010 .. up to 128).
+        self.cursor = 0
+
+    def _spans(self, nb):
+        # Split the next nb slots into contiguous runs that share a bit plane
+        start, stop = self.cursor, self.cursor + nb
+        if stop > self.slots * 8:
+            raise SteganographyException("No available slot remaining (image filled)")
+        offset = 0
+        while start < stop:
+            plane, pos = divmod(start, self.slots)
+            n = min(stop - start, self.slots - pos)
+            yield plane, pos, offset, n
+            start += n
+            offset += n
+        self.cursor = stop
+
+    def _as_bits(self, bits):
+        if isinstance(bits, str):
+            return np.frombuffer(bits.encode("ascii"), dtype=np.uint8) - ord("0")
+        return np.asarray(bits, dtype=np.uint8)
 
     def put_binary_value(self, bits): #Put the bits in the image
-        for c in bits:
-            val = list(self.image[self.curheight,self.curwidth]) #Get the pixel value as a list
-            if int(c) == 1:
-                val[self.curchan] = int(val[self.curchan]) | self.maskONE #OR with maskONE
-            else:
-                val[self.curchan] = int(val[self.curchan]) & self.maskZERO #AND with maskZERO
-                
-            self.image[self.curheight,self.curwidth] = tuple(val)
-            self.next_slot() #Move "cursor" to the next space
-        
-    def next_slot(self):#Move to the next slot were information can be taken or put
-        if self.curchan == self.nbchannels-1: #Next Space is the following channel
-            self.curchan = 0
-            if self.curwidth == self.width-1: #Or the first channel of the next pixel of the same line
-                self.curwidth = 0
-                if self.curheight == self.height-1:#Or the first channel of the first pixel of the next line
-                    self.curheight = 0
-                    if self.maskONE == 128: #Mask 1000000, so the last mask
-                        raise SteganographyException("No available slot remaining (image filled)")
-                    else: #Or instead of using the first bit start using the second and so on..
-                        self.maskONE = self.maskONEValues.pop(0)
-                        self.maskZERO = self.maskZEROValues.pop(0)
-                else:
-                    self.curheight +=1
-            else:
-                self.curwidth +=1
-        else:
-            self.curchan +=1
+        bits = self._as_bits(bits)
+        flat = self.image.reshape(-1)
+        for plane, pos, offset, n in self._spans(bits.size):
+            seg = flat[pos:pos + n]
+            seg &= np.uint8(0xFF ^ (1 << plane)) #AND with the zero mask of the plane
+            seg |= bits[offset:offset + n] << plane #OR with the bit moved to the plane
+
+    def put_bytes(self, data):
+        self.put_binary_value(np.unpackbits(np.frombuffer(data, dtype=np.uint8)))
+
+    def read_array(self, nb): #Read the given number of bits as an array of 0/1
+        flat = self.image.reshape(-1)
+        bits = np.empty(nb, dtype=np.uint8)
+        for plane, pos, offset, n in self._spans(nb):
+            bits[offset:offset + n] = (flat[pos:pos + n] >> plane) & 1
+        return bits
+
+    def read_bytes(self, nb):
+        return np.packbits(self.read_array(nb * 8)).tobytes()
 
     def read_bit(self): #Read a single bit int the image
-        val = self.image[self.curheight,self.curwidth][self.curchan]
-        val = int(val) & self.maskONE
-        self.next_slot()
-        if val > 0:
-            return "1"
-        else:
-            return "0"
-    
+        return self.read_bits(1)
+
     def read_byte(self):
         return self.read_bits(8)
-    
+
     def read_bits(self, nb): #Read the given number of bits
-        bits = ""
-        for i in range(nb):
-            bits += self.read_bit()
-        return bits
+        return (self.read_array(nb) + ord("0")).tobytes().decode("ascii")
 
     def byteValue(self, val):
         return self.binary_value(val, 8)
@@ -83,49 +87,90 @@ class LSBSteg():
         return binval
 
     def encode_text(self, txt):
-        l = len(txt)
-        binl = self.binary_value(l, 16) #Length coded on 2 bytes so the text size can be up to 65536 bytes long
-        self.put_binary_value(binl) #Put text length coded on 4 bytes
-        for char in txt: #And put all the chars
-            c = ord(char)
-            self.put_binary_value(self.byteValue(c))
+        try:
+            data = txt.encode("latin-1") #One byte per char
+        except UnicodeEncodeError as exc:
+            raise SteganographyException("binary value larger than the expected size") from exc
+        binl = self.binary_value(len(data), 16) #Length coded on 2 bytes so the text size can be up to 65536 bytes long
+        self.put_binary_value(binl)
+        self.put_bytes(data) #And put all the chars at once
         return self.image
        
     def decode_text(self):
-        ls = self.read_bits(16) #Read the text size in bytes
-        l = int(ls,2)
-        i = 0
-        unhideTxt = ""
-        while i < l: #Read all bytes of the text
-            tmp = self.read_byte() #So one byte
-            i += 1
-            unhideTxt += chr(int(tmp,2)) #Every chars concatenated to str
-        return unhideTxt
+        l = int(self.read_bits(16), 2) #Read the text size in bytes
+        return self.read_bytes(l).decode("latin-1")
+
+    def encode_payload(self, data, checksum=True):
+        flags = FLAG_CRC32 if checksum else 0
+        if PAYLOAD_HEADER.size + len(data) + 4 * checksum > self.slots:
+            raise SteganographyException("Payload larger than the image capacity")
+        blob = PAYLOAD_HEADER.pack(PAYLOAD_MAGIC, PAYLOAD_VERSION, flags, len(data)) + bytes(data)
+        if checksum:
+            blob += struct.pack(">I", zlib.crc32(data))
+        self.put_bytes(blob)
+        return self.image
+
+    def decode_payload(self):
+        """Read a versioned binary payload, or return None if the image holds none.
+
+        When no payload header is found the cursor is rewound, so the caller can
+        fall back to `decode_text` for images written with the legacy format.
+        """
+        if self.slots < PAYLOAD_HEADER.size * 8:
+            return None
+        magic, version, flags, length = PAYLOAD_HEADER.unpack(self.read_bytes(PAYLOAD_HEADER.size))
+        if magic != PAYLOAD_MAGIC or version != PAYLOAD_VERSION:
+            self.cursor = 0
+            return None
+        if length * 8 > self.slots * 8 - self.cursor:
+            raise SteganographyException("Payload length larger than the image capacity")
+        data = self.read_bytes(length)
+        if flags & FLAG_CRC32 and struct.unpack(">I", self.read_bytes(4))[0] != zlib.crc32(data):
+            raise SteganographyException("Payload checksum mismatch")
+        return data
 
 class LsbSteganographieService:
     def hideSecretMessageInImage(self, image_bytes: bytes, secret_message: str, format_output: str = "png") -> bytes:
-        # Convert bytes to OpenCV image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        return self.hidePayloadInImage(image_bytes, secret_message.encode("utf-8"), format_output)
+
+    def hidePayloadInImage(self, image_bytes: bytes, payload: bytes, format_output: str = "png") -> bytes:
+        img = codec.decode(image_bytes)
         
         steg = LSBSteg(img)
-        stego_img = steg.encode_text(secret_message)
+        stego_img = steg.encode_payload(payload)
         
         # Encode back to bytes
-        output_ext = format_output.lower().lstrip('.')
-        success, buf = cv2.imencode(f".{output_ext}", stego_img)
-        if not success:
+        try:
+            return codec.encode(stego_img, format_output).tobytes()
+        except ValueError:
             raise SteganographyException("Failed to encode image")
-        return buf.tobytes()
     
     def extractSecretMessageFromImage(self, image_bytes: bytes) -> str:
-        # Convert bytes to OpenCV image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Use LSBSteg to decode the text
+        img = codec.decode(image_bytes)
+        return self.extract_message(img)
+
+    def extract_message(self, img) -> str:
         steg = LSBSteg(img)
-        return steg.decode_text()
+        payload = steg.decode_payload()
+        if payload is None:
+            # Image written with the legacy 16-bit length text format
+            return steg.decode_text()
+        return payload.decode("utf-8")
+
+    def extract_payload(self, img) -> bytes:
+        steg = LSBSteg(img)
+        payload = steg.decode_payload()
+        if payload is None:
+            return steg.decode_text().encode("latin-1")
+        return payload
+
+    def extractPayloadFromImage(self, image_bytes: bytes) -> bytes:
+        img = codec.decode(image_bytes)
+
+        payload = LSBSteg(img).decode_payload()
+        if payload is None:
+            raise SteganographyException("No binary payload found in the image")
+        return payload
 
 
-lsbSteganographieService = LsbSteganographieService()
\ No newline at end of file
+lsbSteganographieService = LsbSteganographieService()
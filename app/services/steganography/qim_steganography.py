@@ -1,28 +1,17 @@
-from PIL import Image
-import io
 import numpy as np
 
+from app.services.steganography import codec
+
 class QimSteganographieService:
 
     @staticmethod
     def bytes_to_bits(data_bytes):
-        bits = []
-        for b in data_bytes:
-            for i in range(8)[::-1]:
-                bits.append((b >> i) & 1)
-        return bits
+        return np.unpackbits(np.frombuffer(bytes(data_bytes), dtype=np.uint8))
 
     @staticmethod
     def bits_to_bytes(bits):
-        if len(bits) % 8 != 0:
-            bits += [0] * (8 - len(bits) % 8)
-        out = bytearray()
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for bit in bits[i:i+8]:
-                byte = (byte << 1) | bit
-            out.append(byte)
-        return bytes(out)
+        # packbits complète le dernier octet avec des zéros
+        return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
 
     @staticmethod
     def qim_quantize_scalar(x, b, delta):
@@ -30,90 +19,118 @@ class QimSteganographieService:
         q = delta * round((x - shift) / delta) + shift
         return q
 
+    @staticmethod
+    def qim_quantize(x, b, delta):
+        # Version vectorisée de qim_quantize_scalar (np.round arrondit au pair, comme round)
+        shift = (b * delta) / 2.0
+        return delta * np.round((x - shift) / delta) + shift
+
     @staticmethod
     def embed_bits_in_array(flat_arr, bits, delta):
-        if len(bits) > flat_arr.size:
+        bits = np.asarray(bits, dtype=np.uint8)
+        if bits.size > flat_arr.size:
             raise ValueError("Pas assez de capacité pour écrire tous les bits.")
-        for i, bit in enumerate(bits):
-            x = float(flat_arr[i])
-            q = QimSteganographieService.qim_quantize_scalar(x, bit, delta)
-            flat_arr[i] = np.clip(round(q), 0, 255)
+        x = flat_arr[:bits.size].astype(np.float64)
+        q = QimSteganographieService.qim_quantize(x, bits, delta)
+        flat_arr[:bits.size] = np.clip(np.round(q), 0, 255)
         return flat_arr
 
     @staticmethod
     def extract_bits_from_array(flat_arr, n_bits, delta):
         if n_bits > flat_arr.size:
             raise ValueError("Demande d'extraction > capacité de l'image.")
-        bits = []
-        for i in range(n_bits):
-            x = float(flat_arr[i])
-            q0 = QimSteganographieService.qim_quantize_scalar(x, 0, delta)
-            q1 = QimSteganographieService.qim_quantize_scalar(x, 1, delta)
-            bit = 0 if abs(x - q0) <= abs(x - q1) else 1
-            bits.append(bit)
-        return bits
+        x = flat_arr[:n_bits].astype(np.float64)
+        q0 = QimSteganographieService.qim_quantize(x, 0, delta)
+        q1 = QimSteganographieService.qim_quantize(x, 1, delta)
+        # Bit du réseau le plus proche ; égalité -> 0
+        return (np.abs(x - q1) < np.abs(x - q0)).astype(np.uint8)
 
     @staticmethod
-    def embed_message_rgb(img_rgb: Image.Image, message: str, delta=16):
-        r, g, b = img_rgb.split()
-        b_arr = np.array(b, dtype=np.float32)
-        flat_b = b_arr.flatten()
-
-        msg_bytes = message.encode('utf-8')
+    def embed_message_plane(plane: np.ndarray, message, delta=16):
+        # Écrit le message (texte ou octets) dans un plan uint8 (modifié sur place),
+        # seules les lignes qui portent des bits sont converties en float32
+        msg_bytes = message.encode('utf-8') if isinstance(message, str) else bytes(message)
         msg_len = len(msg_bytes)
         header = msg_len.to_bytes(4, 'big')
         payload = header + msg_bytes
         bits = QimSteganographieService.bytes_to_bits(payload)
 
-        if len(bits) > flat_b.size:
-            raise ValueError(f"Capacité insuffisante: {len(bits)} bits pour {flat_b.size} pixels.")
+        if len(bits) > plane.size:
+            raise ValueError(f"Capacité insuffisante: {len(bits)} bits pour {plane.size} pixels.")
+
+        rows = -(-len(bits) // plane.shape[1])
+        flat = plane[:rows].astype(np.float32).ravel()
+        flat = QimSteganographieService.embed_bits_in_array(flat, bits, delta)
+        plane[:rows] = flat.reshape(rows, plane.shape[1])
+        return plane
+
+    @staticmethod
+    def embed_message_image(image: np.ndarray, message, delta=16):
+        # Image BGR décodée par le codec, le plan bleu est modifié sur place
+        QimSteganographieService.embed_message_plane(codec.blue(image), message, delta)
+        return image
 
-        flat_b = QimSteganographieService.embed_bits_in_array(flat_b, bits, delta)
-        b_stego = flat_b.reshape(b_arr.shape).astype(np.uint8)
+    @staticmethod
+    def plane_samples(plane: np.ndarray, start: int, stop: int):
+        # Échantillons [start, stop) du plan aplati : seules les lignes
+        # concernées sont découpées et converties en float32
+        h, w = plane.shape
+        if stop > w * h:
+            raise ValueError("Demande d'extraction > capacité de l'image.")
+        first, last = start // w, -(-stop // w)
+        return plane[first:last].ravel()[start - first * w:stop - first * w].astype(np.float32)
 
-        stego_img = Image.merge("RGB", (r, g, Image.fromarray(b_stego)))
-        return stego_img
+    @staticmethod
+    def read_payload(read_samples, capacity: int, delta=16) -> bytes:
+        header_flat = read_samples(0, 32)
+        header_bits = QimSteganographieService.extract_bits_from_array(header_flat, 32, delta)
+        msg_len = int.from_bytes(QimSteganographieService.bits_to_bytes(header_bits), 'big')
+        if (4 + msg_len) * 8 > capacity:
+            raise ValueError(f"Longueur annoncée ({msg_len} octets) > capacité de l'image.")
+
+        # Seule la plage du message est lue, l'en-tête n'est pas re-quantifié
+        payload_flat = read_samples(32, 32 + msg_len * 8)
+        payload_bits = QimSteganographieService.extract_bits_from_array(payload_flat, msg_len * 8, delta)
+        return QimSteganographieService.bits_to_bytes(payload_bits)
 
     @staticmethod
-    def extract_message_rgb(img_rgb: Image.Image, delta=16):
-        r, g, b = img_rgb.split()
-        b_arr = np.array(b, dtype=np.float32)
-        flat_b = b_arr.flatten()
-
-        header_bits = QimSteganographieService.extract_bits_from_array(flat_b, 32, delta)
-        header_bytes = QimSteganographieService.bits_to_bytes(header_bits)
-        msg_len = int.from_bytes(header_bytes, 'big')
-
-        n_bits_total = (4 + msg_len) * 8
-        payload_bits = QimSteganographieService.extract_bits_from_array(flat_b, n_bits_total, delta)
-        payload_bytes = QimSteganographieService.bits_to_bytes(payload_bits)
-        msg_bytes = payload_bytes[4:4+msg_len]
+    def read_message(read_samples, capacity: int, delta=16):
+        msg_bytes = QimSteganographieService.read_payload(read_samples, capacity, delta)
         try:
             return msg_bytes.decode('utf-8')
         except Exception:
             return msg_bytes.decode('utf-8', errors='replace')
 
+    @staticmethod
+    def extract_message_plane(plane: np.ndarray, delta=16):
+        return QimSteganographieService.read_message(
+            lambda start, stop: QimSteganographieService.plane_samples(plane, start, stop), plane.size, delta
+        )
+
+    @staticmethod
+    def extract_payload_plane(plane: np.ndarray, delta=16) -> bytes:
+        return QimSteganographieService.read_payload(
+            lambda start, stop: QimSteganographieService.plane_samples(plane, start, stop), plane.size, delta
+        )
+
     @staticmethod
     def hideSecretMessageInImage(image_bytes: bytes, secret_message: str, format_output: str = "png", delta: float = 4) -> bytes:
         try:
-            img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+            img = codec.decode(image_bytes)
         except Exception as e:
             raise ValueError(f"Erreur lecture image: {e}")
 
-        stego_img = QimSteganographieService.embed_message_rgb(img, secret_message, delta=delta)
-
-        output_bytes_io = io.BytesIO()
-        stego_img.save(output_bytes_io, format=format_output.upper())
-        return output_bytes_io.getvalue()
+        stego_img = QimSteganographieService.embed_message_image(img, secret_message, delta=delta)
+        return codec.encode(stego_img, format_output).tobytes()
 
     @staticmethod
     def extractSecretMessageFromImage(image_bytes: bytes, delta: float = 4) -> str:
         try:
-            img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+            img = codec.decode(image_bytes)
         except Exception as e:
             raise ValueError(f"Erreur lecture image: {e}")
 
-        return QimSteganographieService.extract_message_rgb(img, delta=delta)
+        return QimSteganographieService.extract_message_plane(codec.blue(img), delta=delta)
 
 
 qimSteganographieService =  QimSteganographieService()
\ No newline at end of file
@@ -0,0 +1,287 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.steganography import codec, tiles
+from app.services.steganography.dct_steganographie_service import dctSteganographieService
+from app.services.steganography.f5_steganography_service import F5_stegano
+from app.services.steganography.lsb_steganography_service import (
+    LSBSteg, PAYLOAD_HEADER, PAYLOAD_MAGIC, SteganographyException, lsbSteganographieService,
+)
+from app.services.steganography.qim_steganography import qimSteganographieService
+
+
+DEFAULT_OUTPUT_FORMAT = "png"
+
+
+class SignatureNotFoundError(ValueError):
+    pass
+
+
+class CapacityError(ValueError):
+    pass
+
+
+class SteganographyEngine:
+    """Common interface of the steganography algorithms.
+
+    Images are BGR uint8 ndarrays (OpenCV layout): `decode` runs once per image
+    (from bytes or any buffer, e.g. a memoryview on the upload), `embed`/`extract`
+    work on that array (`embed` may modify it in place) and `encode` writes the
+    result back to the requested format, as a 1-D uint8 array (no bytes copy).
+    Messages are bytes (a str is embedded as UTF-8) and `extract` returns bytes.
+    """
+
+    name = ""
+    # Pool the engine is dispatched to (see app.core.executor), None = STEGANO_EXECUTOR
+    executor: Optional[str] = None
+    # Output formats the payload survives; any other requested format is written as png
+    output_formats: List[str] = [DEFAULT_OUTPUT_FORMAT]
+    # Relative extraction cost, cheapest engines are tried first by `reveal_verified`
+    cost = 0
+    # Whether `capacity` needs the decoded pixels, or just the image shape
+    needs_pixels = False
+
+    def decode(self, image_bytes) -> np.ndarray:
+        return codec.decode(image_bytes)
+
+    def output_format(self, format_output: str) -> str:
+        fmt = codec.normalize_format(format_output)
+        return fmt if fmt in self.output_formats else DEFAULT_OUTPUT_FORMAT
+
+    def encode_params(self, fmt: str) -> Optional[Dict[int, int]]:
+        # Flags forced on top of the output profile (see codec.ENCODE_PROFILES)
+        return None
+
+    def encode(self, image: np.ndarray, format_output: str, profile: Optional[str] = None) -> np.ndarray:
+        fmt = self.output_format(format_output)
+        return codec.encode(image, fmt, self.encode_params(fmt), profile)
+
+    def embed(self, image: np.ndarray, message: bytes) -> np.ndarray:
+        raise NotImplementedError
+
+    def extract(self, image: np.ndarray) -> bytes:
+        raise NotImplementedError
+
+    def probe(self, image: np.ndarray) -> bool:
+        """Cheap header-only check that `image` may carry a message of this engine."""
+        return True
+
+    def capacity(self, image_shape: Tuple[int, ...], image: Optional[np.ndarray] = None) -> int:
+        """Largest message (bytes) guaranteed to fit in an image of `image_shape` (h, w, c).
+
+        Engines with `needs_pixels` return an upper bound when `image` is None.
+        """
+        raise NotImplementedError
+
+    def capacity_bounds(self, image_shape: Tuple[int, ...],
+                        image: Optional[np.ndarray] = None) -> Tuple[int, int]:
+        """(`capacity`, size above which a message never fits). Both are the same
+        unless the room left depends on the embedding itself (F5 shrinkage)."""
+        capacity = self.capacity(image_shape, image)
+        return capacity, capacity
+
+    def check_capacity(self, image_shape: Tuple[int, ...], message,
+                       image: Optional[np.ndarray] = None) -> None:
+        # Only rejects what can't fit; `embed` raises CapacityError for the rest
+        size = len(message.encode("utf-8") if isinstance(message, str) else message)
+        capacity = self.capacity_bounds(image_shape, image)[1]
+        if size > capacity:
+            raise CapacityError(
+                f"Message too large for {self.name}: {size} bytes, image capacity is {capacity} bytes"
+            )
+
+    def hide(self, image_bytes, message, format_output: str) -> np.ndarray:
+        image = self.decode(image_bytes)
+        # Checked before any transform
+        self.check_capacity(image.shape, message, image)
+        return self.encode(self.embed(image, message), format_output)
+
+    def reveal(self, image_bytes) -> bytes:
+        return self.extract(self.decode(image_bytes))
+
+
+class F5Engine(SteganographyEngine):
+    name = "f5"
+    cost = 3
+    needs_pixels = True
+    # Lossless formats, and JPEG at F5's own quality 100 / 4:4:4 (see encode_params)
+    output_formats = ["png", "webp", "bmp", "tiff", "jpeg", "jpg"]
+
+    def encode_params(self, fmt):
+        return F5_stegano.encode_params(fmt)
+
+    def embed(self, image, message):
+        try:
+            return F5_stegano.embed_image(image, message, tile_key=tiles.settings_key())
+        except ValueError as e:
+            raise CapacityError(f"Message too large for {self.name}: {e}") from e
+
+    def extract(self, image):
+        return F5_stegano.extract_bytes(codec.green(image), tile_key=tiles.settings_key())
+
+    def capacity_bounds(self, image_shape, image=None):
+        if image is None:
+            # Every coefficient non-zero, none shrinks
+            h, w = image_shape[:2]
+            upper = F5_stegano.capacity_bytes((h // 8) * (w // 8) * 64)
+            return upper, upper
+        return F5_stegano.capacity_bounds(codec.green(image), tile_key=tiles.settings_key())
+
+    def capacity(self, image_shape, image=None):
+        return self.capacity_bounds(image_shape, image)[0]
+
+    def probe(self, image):
+        # 12-bit length header: the message is a non-empty whole number of bytes
+        n_bits = F5_stegano.payload_length(codec.green(image), tile_key=tiles.settings_key())
+        return bool(n_bits) and n_bits % 8 == 0
+
+
+class DctEngine(SteganographyEngine):
+    name = "dct"
+    executor = "thread"
+    output_formats = ["png", "jpeg", "jpg", "webp"]
+    cost = 2
+
+    def embed(self, image, message):
+        try:
+            return dctSteganographieService.embed_dct(image, message, out=image, tile_key=tiles.settings_key())
+        except ValueError as e:
+            raise CapacityError(f"Message too large for {self.name}: {e}") from e
+
+    def extract(self, image):
+        return dctSteganographieService.extract_bytes(image, tile_key=tiles.settings_key())
+
+    def capacity(self, image_shape, image=None):
+        # Binary payloads are COBS-framed (see dct_steganographie_service)
+        return dctSteganographieService.capacity(*image_shape[:2], binary=True)
+
+
+class LsbEngine(SteganographyEngine):
+    name = "lsb"
+    executor = "thread"
+    output_formats = ["png", "webp"]
+
+    def embed(self, image, message):
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        return LSBSteg(image).encode_payload(message)
+
+    def extract(self, image):
+        return lsbSteganographieService.extract_payload(image)
+
+    def capacity(self, image_shape, image=None):
+        # One byte per slot over the 8 bit planes, minus the header and CRC32
+        h, w, c = image_shape
+        return max(0, h * w * c - PAYLOAD_HEADER.size - 4)
+
+    def probe(self, image):
+        steg = LSBSteg(image)
+        if steg.slots < PAYLOAD_HEADER.size * 8:
+            return False
+        magic, _, _, length = PAYLOAD_HEADER.unpack(steg.read_bytes(PAYLOAD_HEADER.size))
+        if magic != PAYLOAD_MAGIC:
+            # Legacy format: 16-bit text length
+            steg.cursor = 0
+            length = int(steg.read_bits(16), 2)
+        return 0 < length * 8 <= steg.slots * 8 - steg.cursor
+
+
+class QimEngine(SteganographyEngine):
+    name = "qim"
+    cost = 1
+    # Quantized pixel values don't survive JPEG
+    output_formats = ["png", "webp"]
+
+    def __init__(self, delta: float = 4):
+        self.delta = delta
+
+    def embed(self, image, message):
+        return qimSteganographieService.embed_message_image(image, message, self.delta)
+
+    def extract(self, image):
+        return qimSteganographieService.extract_payload_plane(codec.blue(image), self.delta)
+
+    def capacity(self, image_shape, image=None):
+        # One bit per blue sample, after the 32-bit length header
+        h, w = image_shape[:2]
+        return max(0, h * w // 8 - 4)
+
+    def probe(self, image):
+        # 32-bit length header, must fit in the blue plane
+        plane = codec.blue(image)
+        if plane.size < 32:
+            return False
+        samples = qimSteganographieService.plane_samples(plane, 0, 32)
+        header = qimSteganographieService.extract_bits_from_array(samples, 32, self.delta)
+        msg_len = int.from_bytes(qimSteganographieService.bits_to_bytes(header), 'big')
+        return 0 < msg_len and (4 + msg_len) * 8 <= plane.size
+
+
+ENGINES: Dict[str, SteganographyEngine] = {
+    engine.name: engine for engine in (F5Engine(), DctEngine(), LsbEngine(), QimEngine())
+}
+ALIASES = {"dct_stegano": "dct"}
+
+
+def get_engine(name: Optional[str] = None) -> SteganographyEngine:
+    """Return the engine called `name`, or the one set by STEGANO_ALGO."""
+    key = (name or get_settings().STEGANO_ALGO or "F5").lower()
+    key = ALIASES.get(key, key)
+    if key not in ENGINES:
+        raise ValueError(f"Unsupported steganography algorithm: {name or key}")
+    return ENGINES[key]
+
+
+def engines_by_cost() -> List[SteganographyEngine]:
+    return sorted(ENGINES.values(), key=lambda engine: engine.cost)
+
+
+def capacities(image, names: Optional[List[str]] = None) -> Dict[str, Tuple[int, int]]:
+    """Message capacity (bytes) of an encoded image for each engine, as
+    (guaranteed capacity, upper bound).
+
+    `image` is the encoded image, as bytes/buffer or as a seekable file. It is
+    decoded only if one of the engines needs the pixels (a file can't be), the
+    others work from the shape read in the image header.
+    """
+    engines = [get_engine(name) for name in names] if names else list(ENGINES.values())
+    decoded = None
+    if any(engine.needs_pixels for engine in engines):
+        decoded = codec.decode(image)
+        shape = decoded.shape
+    else:
+        shape = codec.image_shape(image)
+    return {engine.name: engine.capacity_bounds(shape, decoded) for engine in engines}
+
+
+# What an engine raises on an image that doesn't carry its payload
+EXTRACTION_ERRORS = (ValueError, SteganographyException)
+
+
+def reveal_verified(image_bytes, verify: Callable[[bytes], object],
+                    names: Optional[List[str]] = None,
+                    verify_errors: Tuple[type, ...] = (ValueError,)) -> Tuple[str, object]:
+    """Decode the image once and try the engines in turn, cheapest first.
+
+    Engines whose `probe` fails are skipped; the first extracted message that
+    `verify` accepts (i.e. returns without raising one of `verify_errors`) wins
+    and `(engine name, verify(message))` is returned. `names` restricts the
+    search to the given engines, in that order. Raises SignatureNotFoundError
+    if nothing matched; any other error (decoding, engine bug) propagates.
+    """
+    engines = [get_engine(name) for name in names] if names else engines_by_cost()
+    image = engines[0].decode(image_bytes)
+    for engine in engines:
+        try:
+            if not engine.probe(image):
+                continue
+            message = engine.extract(image)
+        except EXTRACTION_ERRORS:
+            continue
+        try:
+            return engine.name, verify(message)
+        except verify_errors:
+            continue
+    raise SignatureNotFoundError("No signature found in the image")
@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+# Hauteur (en pixels, multiple de 8) des bandes pleine largeur qui découpent l'image
+TILE_ROWS = 64
+
+Span = Tuple[int, int]
+
+
+def tile_spans(rows: int, key: Optional[bytes] = None) -> List[Span]:
+    """Bands [start, stop) of `TILE_ROWS` rows covering rows [0, rows), in carrier order.
+
+    Without `key` the bands go from top to bottom, which is the raster order the
+    engines always used. With a key the order is a permutation derived from
+    HMAC-SHA256(key, start): deterministic, but unknown without the key.
+    """
+    spans = [(start, min(start + TILE_ROWS, rows)) for start in range(0, rows, TILE_ROWS)]
+    if key:
+        spans.sort(key=lambda span: hmac.new(key, span[0].to_bytes(8, "big"), hashlib.sha256).digest())
+    return spans
+
+
+def truncate(spans: List[Span], rows: int) -> List[Span]:
+    """First `rows` rows of the stacked `spans` (the last band may be cut)."""
+    kept = []
+    for start, stop in spans:
+        if rows <= 0:
+            break
+        kept.append((start, min(stop, start + rows)))
+        rows -= stop - start
+    return kept
+
+
+def gather(image: np.ndarray, spans: List[Span]) -> np.ndarray:
+    """Copy of the `spans` rows of `image`, stacked in order."""
+    return np.concatenate([image[start:stop] for start, stop in spans])
+
+
+def scatter(image: np.ndarray, stacked: np.ndarray, spans: List[Span]) -> np.ndarray:
+    """Write back rows stacked by `gather`; the other rows of `image` are left untouched."""
+    offset = 0
+    for start, stop in spans:
+        image[start:stop] = stacked[offset:offset + stop - start]
+        offset += stop - start
+    return image
+
+
+def settings_key() -> Optional[bytes]:
+    # STEGANO_TILE_KEY vide = ordre naturel (haut en bas). Clé unique pour le
+    # serveur et non par utilisateur : à l'extraction, l'utilisateur n'est connu
+    # qu'après avoir lu le jeton, donc après avoir parcouru les bandes. Une image
+    # ne se relit qu'avec la clé utilisée à l'écriture, sans ordre de repli.
+    key = get_settings().STEGANO_TILE_KEY
+    return key.encode("utf-8") if key else None
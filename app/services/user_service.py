@@ -3,7 +3,7 @@ from sqlalchemy.exc import IntegrityError
 from app.repositories.user_repository import UserRepository
 from app.models.users import User
 from app.schemas.users import UserCreate, UserUpdate
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from app.core.security import get_password_hash  # added import
 
 
@@ -27,6 +27,9 @@ class UserService:
     async def get_user_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
         return await self.user_repository.get_by_id(db, user_id)
 
+    async def get_users_by_ids(self, db: AsyncSession, user_ids: Iterable[int]) -> List[User]:
+        return await self.user_repository.get_by_ids(db, set(user_ids))
+
     async def get_user_by_login(self, db: AsyncSession, login: str) -> Optional[User]:
         return await self.user_repository.get_by_login(db, login)
 
@@ -0,0 +1,67 @@
+"""Micro-benchmark of the signature token crypto (per-token cost).
+
+Usage (from the project root, with the same .env as the API):
+
+    python -m benchmarks.bench_crypto
+    python -m benchmarks.bench_crypto --tokens 100000
+"""
+import argparse
+import base64
+import os
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+
+from app.services.cryptography.cryptography import ALPH, SteganoCryptoService
+
+
+def legacy_encrypt(user_id: int) -> str:
+    # Reference: the base64 ChaCha20-Poly1305 token older images still carry
+    nonce = os.urandom(12)
+    message = SteganoCryptoService._caesar_encode(str(user_id)).encode("utf-8")
+    return base64.b64encode(nonce + SteganoCryptoService._aead.encrypt(nonce, message, None)).decode("utf-8")
+
+
+def legacy_decrypt(payload_b64: str) -> str:
+    # Reference: what every call used to do (HKDF + new AEAD + index() Caesar)
+    combined = base64.b64decode(payload_b64)
+    chacha = ChaCha20Poly1305(SteganoCryptoService._derive_key())
+    plaintext = chacha.decrypt(combined[:12], combined[12:], None).decode("utf-8")
+    return "".join(ALPH[(ALPH.index(c) - 5) % len(ALPH)] if c in ALPH else c for c in plaintext)
+
+
+def per_token_us(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=20000, help="tokens per run")
+    args = parser.parse_args()
+
+    user_ids = list(range(1, args.tokens + 1))
+    tokens = SteganoCryptoService.encrypt_many(user_ids)
+    legacy_tokens = [legacy_encrypt(u) for u in user_ids]
+    # Batch verification: mostly valid tokens plus some garbage (last byte flipped)
+    tampered = [token[:-1] + bytes([token[-1] ^ 0x01]) for token in tokens[: args.tokens // 10]]
+
+    print(f"Signature tokens, {args.tokens} per run (microseconds per token)")
+    print(f"Token size: {len(tokens[-1])} bytes (legacy: {len(legacy_tokens[-1])} chars)")
+    rows = [
+        ("encrypt_for_user", lambda: [SteganoCryptoService.encrypt_for_user(u) for u in user_ids]),
+        ("encrypt_many", lambda: SteganoCryptoService.encrypt_many(user_ids)),
+        ("decrypt (per-call HKDF)", lambda: [legacy_decrypt(t) for t in legacy_tokens]),
+        ("decrypt_for_user (legacy)", lambda: [SteganoCryptoService.decrypt_for_user(t) for t in legacy_tokens]),
+        ("decrypt_for_user", lambda: [SteganoCryptoService.decrypt_for_user(t) for t in tokens]),
+        ("decrypt_many", lambda: SteganoCryptoService.decrypt_many(tokens)),
+        ("decrypt_many (tampered)", lambda: SteganoCryptoService.decrypt_many(tampered)),
+    ]
+    for name, fn in rows:
+        count = len(tampered) if "tampered" in name else args.tokens
+        print(f"{name:>26} {per_token_us(fn, count):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
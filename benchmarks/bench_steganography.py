@@ -0,0 +1,143 @@
+"""Micro-benchmarks for the steganography services.
+
+Usage (from the project root, with the same .env as the API):
+
+    python -m benchmarks.bench_steganography
+    python -m benchmarks.bench_steganography --sizes 1 12
+    python -m benchmarks.bench_steganography --suite engines
+    python -m benchmarks.bench_steganography --suite encode --sizes 12
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.services.steganography import codec
+from app.services.steganography.block_dct import BlockDctEngine
+from app.services.steganography.f5_steganography_service import F5_stegano
+from app.services.steganography.registry import ENGINES
+
+# Dimensions (h, w) of the test images, keyed by megapixels
+IMAGE_SIZES = {
+    1: (864, 1152),
+    12: (3000, 4000),
+    48: (6000, 8000),
+}
+
+
+def make_plane(h: int, w: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    plane = 128 + 60 * np.sin(x / 37.0) + 50 * np.cos(y / 23.0) + rng.normal(0, 12, (h, w))
+    return np.clip(plane, 0, 255).astype(np.float32)
+
+
+def per_block_dct(plane: np.ndarray, q: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
+    # Reference: one cv2.dct call per 8x8 block, as the F5 service used to do
+    for i in range(block_y):
+        for j in range(block_x):
+            block = plane[8 * i:8 * (i + 1), 8 * j:8 * (j + 1)]
+            plane[8 * i:8 * (i + 1), 8 * j:8 * (j + 1)] = np.around(np.around(cv2.dct(block)) / q)
+    return plane
+
+
+def per_block_idct(plane: np.ndarray, q: np.ndarray, block_y: int, block_x: int) -> np.ndarray:
+    for i in range(block_y):
+        for j in range(block_x):
+            block = plane[8 * i:8 * (i + 1), 8 * j:8 * (j + 1)]
+            plane[8 * i:8 * (i + 1), 8 * j:8 * (j + 1)] = cv2.idct(block * q)
+    return plane
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def bench_block_dct(sizes):
+    q = F5_stegano.Q.astype(np.float32)
+    engine = BlockDctEngine(q)
+    print("F5 block DCT/quantization (forward + inverse)")
+    print(f"{'MP':>4} {'per-block (s)':>14} {'batched (s)':>12} {'speedup':>8}")
+    for mp in sizes:
+        h, w = IMAGE_SIZES[mp]
+        plane = make_plane(h, w)
+        block_y, block_x = h // 8, w // 8
+
+        ref = plane.copy()
+        t_ref = timed(per_block_dct, ref, q, block_y, block_x)
+        t_ref += timed(per_block_idct, ref, q, block_y, block_x)
+
+        new = plane.copy()
+        t_new = timed(engine.forward, new, block_y, block_x)
+        t_new += timed(engine.inverse, new, block_y, block_x)
+
+        print(f"{mp:>4} {t_ref:>14.3f} {t_new:>12.3f} {t_ref / t_new:>7.1f}x")
+
+
+def make_image(h: int, w: int) -> np.ndarray:
+    planes = [make_plane(h, w, seed) for seed in range(3)]
+    return np.stack(planes, axis=-1).astype(np.uint8)
+
+
+def bench_engines(sizes, message: str = "x" * 44):
+    # Each image is decoded once and shared by all the engines
+    print("Steganography engines (embed / PNG encode / extract, seconds)")
+    print(f"{'MP':>4} {'engine':>6} {'embed':>8} {'encode':>8} {'extract':>8}")
+    for mp in sizes:
+        h, w = IMAGE_SIZES[mp]
+        image = make_image(h, w)
+        for name, engine in ENGINES.items():
+            stego = image.copy()
+            start = time.perf_counter()
+            stego = engine.embed(stego, message)
+            t_embed = time.perf_counter() - start
+            t_encode = timed(engine.encode, stego, "png")
+            t_extract = timed(engine.extract, stego)
+            print(f"{mp:>4} {name:>6} {t_embed:>8.3f} {t_encode:>8.3f} {t_extract:>8.3f}")
+
+
+def make_flat_image(h: int, w: int) -> np.ndarray:
+    # Same gradients without the noise: large flat areas, as in screenshots/drawings
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    planes = [128 + 60 * np.sin(x / 37.0) + 50 * np.cos(y / 23.0) + 10 * c for c in range(3)]
+    return np.clip(np.stack(planes, axis=-1), 0, 255).astype(np.uint8)
+
+
+def bench_encode(sizes, formats=("png", "jpeg", "webp")):
+    print("Stego output encoding per profile (seconds / MB)")
+    print(f"{'MP':>4} {'image':>6} {'format':>6} " + " ".join(f"{p:>17}" for p in codec.ENCODE_PROFILES))
+    for mp in sizes:
+        h, w = IMAGE_SIZES[mp]
+        for kind, image in (("photo", make_image(h, w)), ("flat", make_flat_image(h, w))):
+            for fmt in formats:
+                cells = []
+                for profile in codec.ENCODE_PROFILES:
+                    start = time.perf_counter()
+                    size = codec.encode(image, fmt, profile=profile).nbytes
+                    cells.append(f"{time.perf_counter() - start:>7.3f}s {size / 1e6:>7.2f}MB")
+                print(f"{mp:>4} {kind:>6} {fmt:>6} " + " ".join(cells))
+
+
+SUITES = {
+    "block-dct": bench_block_dct,
+    "encode": bench_encode,
+    "engines": bench_engines,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=sorted(IMAGE_SIZES),
+                        choices=sorted(IMAGE_SIZES), help="image sizes in megapixels")
+    parser.add_argument("--suite", nargs="+", default=sorted(SUITES), choices=sorted(SUITES),
+                        help="benchmarks to run")
+    args = parser.parse_args()
+    for suite in args.suite:
+        SUITES[suite](args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Settings required by app.core.config, for running the tests without a .env
+os.environ.setdefault("MY_SQL_USER", "test")
+os.environ.setdefault("MY_SQL_PASSWORD", "test")
+os.environ.setdefault("MY_SQL_DB", "test")
+os.environ.setdefault("CRYPTO_MASTER_KEY", "11" * 32)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """TestClient on the app, backed by a throwaway sqlite database.
+
+    Returns the client; `api.login()` creates a user and returns its auth headers.
+    """
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core import database
+    from app.core.revocation import get_revocation_store
+    from app.main import app
+    from app.models import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    asyncio.run(create_tables())
+
+    async def get_test_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[database.get_session] = get_test_session
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    get_revocation_store.cache_clear()
+    # Lifespan (MySQL init) is not run: the client is not used as a context manager
+    client = TestClient(app)
+    client.engine = engine
+
+    def login(login: str = "jdoe") -> dict:
+        client.post("/api/users/", json={"nom": "Doe", "prenom": "John", "login": login, "mdp": "pw"})
+        response = client.post("/api/users/login", json={"login": login, "mdp": "pw"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    client.login = login
+    yield client
+    app.dependency_overrides.clear()
+    get_revocation_store.cache_clear()
+    asyncio.run(engine.dispose())
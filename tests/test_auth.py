@@ -0,0 +1,115 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.core import auth, database
+from app.core.auth import AuthContext, create_access_token, get_auth_context, get_current_user
+from app.main import app as main_app
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Count the user queries and revocation checks."""
+    counts = {"user": 0, "revoked": 0}
+    get_user_by_id = auth.user_service.get_user_by_id
+    is_token_revoked = auth.is_token_revoked
+
+    async def counting_get_user(db, user_id):
+        counts["user"] += 1
+        return await get_user_by_id(db, user_id)
+
+    async def counting_is_revoked(token):
+        counts["revoked"] += 1
+        return await is_token_revoked(token)
+
+    monkeypatch.setattr(auth.user_service, "get_user_by_id", counting_get_user)
+    monkeypatch.setattr(auth, "is_token_revoked", counting_is_revoked)
+    return counts
+
+
+@pytest.fixture
+def client(api):
+    """Client on a small app whose route resolves the user through several dependencies."""
+    app = FastAPI()
+    app.dependency_overrides[database.get_session] = main_app.dependency_overrides[database.get_session]
+
+    async def owner(request: Request, db=Depends(database.get_session)):
+        # Distinct from get_current_user, so FastAPI doesn't share its result
+        return await get_auth_context(request).get_user(db)
+
+    @app.get("/me")
+    async def me(user=Depends(get_current_user), same=Depends(owner)):
+        assert user is same
+        return {"id": user.id}
+
+    @app.get("/public")
+    async def public():
+        return {}
+
+    test_client = TestClient(app)
+    test_client.login = api.login
+    return test_client
+
+
+def test_one_user_lookup_per_request(client, lookups):
+    headers = client.login()
+    lookups.update(user=0, revoked=0)
+    for _ in range(2):
+        assert client.get("/me", headers=headers).status_code == 200
+    assert lookups == {"user": 2, "revoked": 2}
+
+
+def test_public_routes_load_nothing(api, client, lookups):
+    headers = client.login()
+    lookups.update(user=0, revoked=0)
+    assert client.get("/public", headers=headers).status_code == 200
+    assert api.get("/", headers={"Authorization": "Bearer not-a-jwt"}).status_code == 200
+    assert lookups == {"user": 0, "revoked": 0}
+
+
+def test_tokens_without_sub_use_the_user_claim(client):
+    user_id = client.get("/me", headers=client.login()).json()["id"]
+    token = create_access_token({"user": {"id": user_id}})
+    response = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json() == {"id": user_id}
+
+    token = create_access_token({"user": {}})
+    response = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token payload"
+
+
+def test_revoked_tokens_are_rejected(api, client, lookups):
+    headers = client.login()
+    assert api.post("/api/users/logout", headers=headers).status_code == 200
+    lookups.update(user=0, revoked=0)
+    response = client.get("/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+    # Both dependencies got the cached failure: one check, no user query
+    assert lookups == {"user": 0, "revoked": 1}
+
+
+@pytest.mark.asyncio
+async def test_failures_are_cached(monkeypatch, lookups):
+    async def revoked(token):
+        lookups["revoked"] += 1
+        return True
+
+    monkeypatch.setattr(auth, "is_token_revoked", revoked)
+    context = AuthContext(create_access_token({"sub": "1"}))
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await context.get_user(db=None)
+        assert exc_info.value.detail == "Token revoked"
+    assert lookups == {"user": 0, "revoked": 1}
+
+    context = AuthContext("not-a-jwt")
+    errors = []
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await context.get_user(db=None)
+        errors.append(exc_info.value)
+    assert errors[0] is errors[1] and errors[0].detail == "Invalid token"
+    assert lookups == {"user": 0, "revoked": 1}
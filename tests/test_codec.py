@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from app.services.steganography import codec
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:256, 0:320].astype(np.float32)
+    flat = np.stack([128 + 60 * np.sin(x / 37.0) + 50 * np.cos(y / 23.0) + 10 * c for c in range(3)], -1)
+    noisy = flat + rng.normal(0, 12, flat.shape)
+    return {
+        "flat": np.clip(flat, 0, 255).astype(np.uint8),
+        "noisy": np.clip(noisy, 0, 255).astype(np.uint8),
+    }
+
+
+@pytest.mark.parametrize("kind", ["flat", "noisy"])
+def test_png_profiles_get_smaller_from_fast_to_smallest(kind):
+    image = _images()[kind]
+    sizes = [codec.encode(image, "png", profile=profile).nbytes for profile in ("fast", "balanced", "smallest")]
+    assert sizes[0] >= sizes[1] >= sizes[2]
+
+
+@pytest.mark.parametrize("profile", sorted(codec.ENCODE_PROFILES))
+@pytest.mark.parametrize("fmt", ["png", "webp"])
+def test_lossless_profiles_keep_the_pixels(profile, fmt):
+    image = _images()["noisy"]
+    assert np.array_equal(codec.decode(codec.encode(image, fmt, profile=profile)), image)
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        codec.encode_params("png", profile="tiny")
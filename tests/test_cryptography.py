@@ -0,0 +1,196 @@
+import base64
+import os
+
+import pytest
+
+from app.services.cryptography import cryptography
+from app.services.cryptography.cryptography import (
+    FLAG_KEY_ID, FLAG_NONCE, FLAG_TIMESTAMP, TOKEN_NONCE_BYTES, TOKEN_VERSION, SteganoCryptoService,
+    _read_varint, _varint,
+)
+
+
+@pytest.fixture
+def token_settings(monkeypatch):
+    def configure(nonce=True, timestamp=False):
+        monkeypatch.setattr(cryptography.settings, "CRYPTO_TOKEN_NONCE", nonce)
+        monkeypatch.setattr(cryptography.settings, "CRYPTO_TOKEN_TIMESTAMP", timestamp)
+    configure()
+    return configure
+
+
+@pytest.mark.parametrize("value, encoded", [
+    (0, b"\x00"),
+    (1, b"\x01"),
+    (127, b"\x7f"),
+    (128, b"\x80\x01"),
+    (300, b"\xac\x02"),
+    (16383, b"\xff\x7f"),
+    (16384, b"\x80\x80\x01"),
+    (2 ** 63 - 1, b"\xff" * 8 + b"\x7f"),
+])
+def test_varint_round_trip(value, encoded):
+    assert _varint(value) == encoded
+    assert _read_varint(b"\xaa" + encoded + b"\xbb", 1) == (value, 1 + len(encoded))
+
+
+def test_varint_rejects_negative_truncated_and_overlong():
+    with pytest.raises(ValueError):
+        _varint(-1)
+    with pytest.raises(ValueError):
+        _read_varint(b"\x80\x80", 0)
+    with pytest.raises(ValueError):
+        _read_varint(b"", 0)
+    with pytest.raises(ValueError):
+        _read_varint(b"\xff" * 10 + b"\x01", 0)
+
+
+@pytest.mark.parametrize("user_id", [0, 1, 127, 128, 987, 2 ** 31 - 1, 2 ** 40])
+def test_round_trip(token_settings, user_id):
+    token = SteganoCryptoService.encrypt_for_user(user_id)
+    assert isinstance(token, bytes)
+    assert token[0] >> 4 == TOKEN_VERSION
+    assert SteganoCryptoService.read_token(token).user_id == user_id
+    assert SteganoCryptoService.decrypt_for_user(token) == str(user_id)
+
+
+def test_default_tokens_have_a_nonce_and_are_unlinkable(token_settings):
+    first = SteganoCryptoService.encrypt_for_user(42)
+    second = SteganoCryptoService.encrypt_for_user(42)
+    assert first[0] & FLAG_NONCE
+    assert first != second
+    # header + nonce + 16-byte SIV + 1-byte user id
+    assert len(first) == 1 + TOKEN_NONCE_BYTES + 16 + 1
+
+
+def test_without_nonce_tokens_are_deterministic(token_settings):
+    token_settings(nonce=False)
+    token = SteganoCryptoService.encrypt_for_user(42)
+    assert token == SteganoCryptoService.encrypt_for_user(42)
+    assert len(token) == 1 + 16 + 1
+
+
+def test_timestamp(token_settings):
+    token_settings(timestamp=True)
+    token = SteganoCryptoService.encrypt_for_user(7)
+    assert token[0] & FLAG_TIMESTAMP
+    read = SteganoCryptoService.read_token(token)
+    assert read.user_id == 7 and read.issued_at > 0
+
+
+def test_aad_is_authenticated(token_settings):
+    token = SteganoCryptoService.encrypt_for_user(5, aad="image-1")
+    assert SteganoCryptoService.decrypt_for_user(token, aad="image-1") == "5"
+    with pytest.raises(ValueError):
+        SteganoCryptoService.decrypt_for_user(token, aad="image-2")
+    with pytest.raises(ValueError):
+        SteganoCryptoService.decrypt_for_user(token)
+
+
+def test_any_tampered_byte_is_rejected(token_settings):
+    token = SteganoCryptoService.encrypt_for_user(123456)
+    for pos in range(len(token)):
+        for mask in (0x01, 0x80):
+            tampered = bytearray(token)
+            tampered[pos] ^= mask
+            with pytest.raises(ValueError):
+                SteganoCryptoService.decrypt_for_user(bytes(tampered))
+
+
+def test_truncated_tokens_are_rejected(token_settings):
+    token = SteganoCryptoService.encrypt_for_user(123456)
+    for size in range(len(token)):
+        with pytest.raises(ValueError):
+            SteganoCryptoService.decrypt_for_user(token[:size])
+
+
+def test_decrypt_many_gives_none_for_invalid_tokens(token_settings):
+    tokens = SteganoCryptoService.encrypt_many([1, 2])
+    assert SteganoCryptoService.decrypt_many(tokens + [b"\x10garbage", "not base64!"]) == ["1", "2", None, None]
+
+
+def _legacy_token(user_id: int) -> str:
+    # base64(nonce + ChaCha20-Poly1305(Caesar(user id))), as issued before the compact format
+    nonce = os.urandom(12)
+    message = SteganoCryptoService._caesar_encode(str(user_id)).encode("utf-8")
+    return base64.b64encode(nonce + SteganoCryptoService._aead.encrypt(nonce, message, None)).decode("utf-8")
+
+
+def test_legacy_tokens_are_still_accepted():
+    token = _legacy_token(987)
+    assert not SteganoCryptoService.is_compact_token(token.encode("ascii"))
+    assert SteganoCryptoService.decrypt_for_user(token) == "987"
+    # As extracted from an image: bytes
+    assert SteganoCryptoService.decrypt_for_user(token.encode("ascii")) == "987"
+    with pytest.raises(ValueError):
+        SteganoCryptoService.decrypt_for_user(token[:-4] + "AAA=")
+
+
+KEY_0, KEY_1, KEY_2 = "11" * 32, "22" * 32, "33" * 32
+
+
+@pytest.fixture
+def keyring(monkeypatch, token_settings):
+    """Build a service as configured with `master_key` under `key_id`."""
+    def make(master_key=KEY_0, key_id=0, retired=""):
+        monkeypatch.setattr(cryptography.settings, "CRYPTO_MASTER_KEY", master_key)
+        monkeypatch.setattr(cryptography.settings, "CRYPTO_KEY_ID", key_id)
+        monkeypatch.setattr(cryptography.settings, "CRYPTO_RETIRED_KEYS", retired)
+        return type(SteganoCryptoService)()
+    return make
+
+
+def test_tokens_of_a_retired_key_still_decrypt(keyring):
+    old = keyring(KEY_1, key_id=1)
+    token = old.encrypt_for_user(42, aad="doc")
+    assert token[0] & FLAG_KEY_ID and token[1] == 1
+
+    new = keyring(KEY_2, key_id=2, retired=f"0:{KEY_0},1:{KEY_1}")
+    assert new.read_token(token, aad="doc") == (42, None, 1)
+    fresh = new.encrypt_for_user(42, aad="doc")
+    assert new.read_token(fresh, aad="doc").key_id == 2
+    # The old key can't read what the new one issues
+    with pytest.raises(ValueError):
+        old.read_token(fresh, aad="doc")
+
+
+def test_unknown_key_id_is_rejected(keyring):
+    token = keyring(KEY_1, key_id=200).encrypt_for_user(42)
+    # Key ids are varints: 200 takes two bytes
+    assert token[1:3] == _varint(200)
+    service = keyring(KEY_2, key_id=1, retired=f"0:{KEY_0}")
+    with pytest.raises(ValueError, match="Unknown key id 200"):
+        service.read_token(token)
+    assert service.decrypt_many([token]) == [None]
+
+
+def test_tokens_without_key_id_use_key_0(keyring):
+    original = keyring()
+    compact = original.encrypt_for_user(7)
+    assert not compact[0] & FLAG_KEY_ID
+    legacy = _legacy_token(7)
+
+    rotated = keyring(KEY_1, key_id=1, retired=f"0:{KEY_0}")
+    assert rotated.read_token(compact) == (7, None, 0)
+    assert rotated.decrypt_for_user(legacy) == "7"
+
+    # Key 0 no longer configured: neither can be read
+    dropped = keyring(KEY_1, key_id=1)
+    for token in (compact, legacy):
+        with pytest.raises(ValueError):
+            dropped.decrypt_for_user(token)
+
+
+@pytest.mark.parametrize("retired", ["1", "x:" + KEY_1, f"1:{KEY_1},1:{KEY_2}", "1:abcd", f"0:{KEY_1}"])
+def test_invalid_keyring_configuration(keyring, retired):
+    with pytest.raises(RuntimeError):
+        keyring(retired=retired)
+
+
+@pytest.mark.parametrize("user_id", [1, 127, 128, 5000, 10 ** 6])
+def test_token_sizes_against_legacy(token_settings, user_id):
+    # See the measured sizes next to TOKEN_VERSION
+    legacy = len(_legacy_token(user_id))
+    assert len(SteganoCryptoService.encrypt_for_user(user_id)) * 2 <= legacy + 4
+    token_settings(nonce=False)
+    assert len(SteganoCryptoService.encrypt_for_user(user_id)) * 2 < legacy
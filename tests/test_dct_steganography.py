@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.services.steganography.dct_steganographie_service import (
+    cobs_decode, cobs_encode, dctSteganographieService,
+)
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\x00",
+    b"\x00\x00\x00",
+    b"abc",
+    b"a\x00b\x00\x00c\x00",
+    b"\x01" * 253,
+    b"\x01" * 254,
+    b"\x01" * 255,
+    b"\x01" * 254 + b"\x00",
+    b"\x00" + b"\x01" * 600 + b"\x00",
+    bytes(range(256)) * 3,
+])
+def test_cobs_round_trip(data):
+    encoded = cobs_encode(data)
+    assert b"\x00" not in encoded
+    assert len(encoded) <= len(data) + 1 + len(data) // 254
+    assert cobs_decode(encoded) == data
+
+
+def test_cobs_decode_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x05ab")
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x02a\x00")
+
+
+def _framed_bits(payload_size: int) -> int:
+    # Marker + COBS + terminating NUL
+    return (1 + len(cobs_encode(b"\x01" * payload_size)) + 1) * 8
+
+
+def test_binary_capacity_is_the_largest_payload_that_fits():
+    # One row of blocks: the image carries exactly `blocks` bits
+    for blocks in range(24, 8 * 700, 8):
+        payload = dctSteganographieService.capacity(16, 8 * blocks + 8, binary=True)
+        assert _framed_bits(payload) <= blocks
+        assert _framed_bits(payload + 1) > blocks
+
+
+def test_binary_payload_with_nuls_round_trip():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (520, 520, 3), dtype=np.uint8)
+    payload = b"\x10\x00token\x00\x00\xffend\x00"
+    stego = dctSteganographieService.embed_dct(image.copy(), payload)
+    assert dctSteganographieService.extract_bytes(stego) == payload
+    # Text messages keep the legacy layout
+    stego = dctSteganographieService.embed_dct(image.copy(), "hello")
+    assert dctSteganographieService.extract_dct(stego) == "hello"
+    assert dctSteganographieService.extract_bytes(stego) == b"hello"
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.executor import JobExecutor
+
+
+def _crash():
+    os._exit(1)
+
+
+def _square(x):
+    return x * x
+
+
+@pytest.mark.asyncio
+async def test_crashed_worker_gets_503_and_pool_is_replaced():
+    executor = JobExecutor("process", workers=1, timeout=30)
+    try:
+        assert await executor.run(_square, 3) == 9
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(_crash)
+        assert exc.value.status_code == 503
+        # The next jobs run on a new pool
+        assert await executor.run(_square, 4) == 16
+        assert await executor.run(_square, 5) == 25
+        assert executor.pending == 0
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_thread_executor_runs_jobs():
+    executor = JobExecutor("thread", workers=2)
+    try:
+        assert await executor.run(_square, 7) == 49
+    finally:
+        executor.shutdown()
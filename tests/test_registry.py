@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.cryptography.cryptography import SteganoCryptoService
+from app.services.steganography.registry import (
+    ENGINES, CapacityError, SignatureNotFoundError, reveal_verified,
+)
+
+
+def _image(h: int, w: int, seed: int = 0) -> np.ndarray:
+    # Smooth gradient plus noise: many +/-1 DCT coefficients, so F5 shrinks a lot
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w]
+    base = 128 + 60 * np.sin(x / 37.0) + 50 * np.cos(y / 23.0)
+    image = np.stack([base + rng.normal(0, 12, (h, w)) + 10 * c for c in range(3)], -1)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("shape", [(264, 200), (120, 96)])
+def test_f5_guaranteed_capacity_always_fits(shape):
+    engine = ENGINES["f5"]
+    image = _image(*shape)
+    capacity, upper = engine.capacity_bounds(image.shape, image)
+    assert 0 < capacity <= upper
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        payload = rng.bytes(capacity)
+        stego = engine.embed(image.copy(), payload)
+        assert engine.extract(stego) == payload
+
+
+def test_f5_shrinkage_failure_is_a_capacity_error():
+    engine = ENGINES["f5"]
+    image = _image(264, 200)
+    _, upper = engine.capacity_bounds(image.shape, image)
+    encoded = cv2.imencode(".png", image)[1]
+    # Past the upper bound: rejected before embedding
+    with pytest.raises(CapacityError):
+        engine.hide(encoded, b"x" * (upper + 1), "png")
+    # Under it, but too much is lost to shrinkage: rejected by the embedding
+    with pytest.raises(CapacityError):
+        engine.hide(encoded, b"x" * upper, "png")
+
+
+def test_dct_embed_failure_is_a_capacity_error():
+    engine = ENGINES["dct"]
+    image = _image(64, 64)
+    with pytest.raises(CapacityError):
+        engine.embed(image, b"x" * 64)
+
+
+@pytest.mark.parametrize("name, requested", [
+    ("qim", "jpeg"),
+    ("lsb", "jpeg"),
+    ("f5", "gif"),
+    ("dct", "gif"),
+])
+def test_pixel_domain_engines_never_write_jpeg(name, requested):
+    # Formats the payload doesn't survive are written as png instead
+    engine = ENGINES[name]
+    assert engine.output_format(requested.upper()) == "png"
+    assert engine.output_format("webp") == "webp"
+    image = _image(256, 256)
+    stego = engine.hide(cv2.imencode(".png", image)[1], b"token", requested)
+    assert bytes(stego[:8]) == b"\x89PNG\r\n\x1a\n"
+    assert engine.reveal(stego) == b"token"
+
+
+@pytest.mark.parametrize("name, fmt", [
+    ("f5", "jpeg"), ("f5", "webp"), ("f5", "bmp"), ("f5", "tiff"),
+    ("dct", "jpeg"), ("dct", "webp"),
+])
+def test_engines_survive_their_output_formats(name, fmt):
+    engine = ENGINES[name]
+    assert engine.output_format(fmt) == fmt
+    stego = engine.hide(cv2.imencode(".png", _image(256, 256))[1], b"token", fmt)
+    assert engine.reveal(stego) == b"token"
+
+
+def _verify(message: bytes) -> int:
+    return int(SteganoCryptoService.decrypt_for_user(message))
+
+
+def _signed(name: str, user_id: int = 42) -> bytes:
+    engine = ENGINES[name]
+    encoded = cv2.imencode(".png", _image(256, 256))[1]
+    return engine.hide(encoded, SteganoCryptoService.encrypt_for_user(user_id), "png").tobytes()
+
+
+@pytest.mark.parametrize("name", ["f5", "dct", "lsb", "qim"])
+def test_auto_detection_finds_each_engine(name):
+    assert reveal_verified(_signed(name), _verify) == (name, 42)
+
+
+def test_names_restrict_the_search():
+    stego = _signed("f5")
+    assert reveal_verified(stego, _verify, ["f5"]) == ("f5", 42)
+    with pytest.raises(SignatureNotFoundError):
+        reveal_verified(stego, _verify, ["qim", "lsb", "dct"])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_unsigned_image_is_not_found(seed):
+    plain = cv2.imencode(".png", _image(256, 256, seed))[1].tobytes()
+    with pytest.raises(SignatureNotFoundError):
+        reveal_verified(plain, _verify)
+
+
+def test_engine_bugs_are_not_hidden(monkeypatch):
+    def broken(image):
+        raise IndexError("bug")
+    # QIM is the cheapest engine, tried first
+    monkeypatch.setattr(ENGINES["qim"], "probe", broken)
+    with pytest.raises(IndexError):
+        reveal_verified(_signed("f5"), _verify)
+
+
+def test_undecodable_image_is_an_error():
+    with pytest.raises(ValueError, match="décoder"):
+        reveal_verified(b"not an image", _verify)
@@ -0,0 +1,133 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.core import revocation
+from app.core.revocation import MemoryRevocationStore, RevokedToken, SqlRevocationStore
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake `time.time()` for the stores; set `clock.now` to move it."""
+    class Clock:
+        now = NOW
+
+    monkeypatch.setattr(revocation.time, "time", lambda: Clock.now)
+    return Clock
+
+
+@pytest.mark.asyncio
+async def test_memory_store_evicts_at_exp(clock):
+    store = MemoryRevocationStore()
+    await store.revoke("short", NOW + 10)
+    await store.revoke("long", NOW + 1000)
+    assert await store.is_revoked("short") and await store.is_revoked("long")
+    assert not await store.is_revoked("other")
+    assert len(store) == 2
+
+    clock.now = NOW + 10
+    assert not await store.is_revoked("short")
+    assert await store.is_revoked("long")
+    assert len(store) == 1
+
+    clock.now = NOW + 1000
+    assert len(store) == 0
+    assert store._heap == []
+
+
+@pytest.mark.asyncio
+async def test_memory_store_ignores_expired_tokens(clock):
+    store = MemoryRevocationStore()
+    await store.revoke("gone", NOW - 1)
+    await store.revoke("now", NOW)
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_store_revoking_twice_keeps_the_latest_exp(clock):
+    store = MemoryRevocationStore()
+    await store.revoke("token", NOW + 10)
+    await store.revoke("token", NOW + 100)
+    await store.revoke("token", NOW + 5)
+    assert len(store) == 1
+
+    # The stale heap item at NOW + 10 must not evict the entry
+    clock.now = NOW + 50
+    assert await store.is_revoked("token")
+    clock.now = NOW + 100
+    assert not await store.is_revoked("token")
+    assert store._heap == []
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'revoked.db'}"
+
+
+async def _rows(store: SqlRevocationStore) -> int:
+    async with await store._session() as session:
+        return await session.scalar(select(func.count()).select_from(RevokedToken))
+
+
+@pytest.mark.asyncio
+async def test_sql_store_is_shared_between_instances(clock, sqlite_url):
+    writer, reader = SqlRevocationStore(sqlite_url), SqlRevocationStore(sqlite_url)
+    assert not await reader.is_revoked("token")
+    await writer.revoke("token", NOW + 60)
+    assert await reader.is_revoked("token")
+    assert not await reader.is_revoked("other")
+
+
+@pytest.mark.asyncio
+async def test_sql_store_stores_digests_not_tokens(clock, sqlite_url):
+    store = SqlRevocationStore(sqlite_url)
+    await store.revoke("secret-jwt", NOW + 60)
+    async with await store._session() as session:
+        hashes = (await session.scalars(select(RevokedToken.token_hash))).all()
+    assert hashes == [revocation.token_digest("secret-jwt").hex()]
+
+
+@pytest.mark.asyncio
+async def test_sql_store_revoking_twice_is_an_upsert(clock, sqlite_url):
+    store = SqlRevocationStore(sqlite_url)
+    await store.revoke("token", NOW + 10)
+    await store.revoke("token", NOW + 100)
+    assert await _rows(store) == 1
+
+    clock.now = NOW + 50
+    assert await SqlRevocationStore(sqlite_url).is_revoked("token")
+
+
+@pytest.mark.asyncio
+async def test_sql_store_expires_and_purges(clock, sqlite_url):
+    store = SqlRevocationStore(sqlite_url)
+    await store.revoke("short", NOW + 10)
+    await store.revoke("long", NOW + 1000)
+
+    clock.now = NOW + 10
+    assert not await SqlRevocationStore(sqlite_url).is_revoked("short")
+    # Expired rows are deleted on the next revocation
+    await store.revoke("new", NOW + 1000)
+    assert await _rows(store) == 2
+    assert await store.is_revoked("long")
+
+
+def test_backend_setting(monkeypatch, sqlite_url):
+    settings = revocation.get_settings()
+    try:
+        monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", "memory")
+        revocation.get_revocation_store.cache_clear()
+        assert isinstance(revocation.get_revocation_store(), MemoryRevocationStore)
+
+        monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", "SQL")
+        monkeypatch.setattr(settings, "TOKEN_REVOCATION_URL", sqlite_url)
+        revocation.get_revocation_store.cache_clear()
+        assert isinstance(revocation.get_revocation_store(), SqlRevocationStore)
+
+        monkeypatch.setattr(settings, "TOKEN_REVOCATION_BACKEND", "redis")
+        revocation.get_revocation_store.cache_clear()
+        with pytest.raises(ValueError):
+            revocation.get_revocation_store()
+    finally:
+        revocation.get_revocation_store.cache_clear()
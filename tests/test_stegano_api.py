@@ -0,0 +1,35 @@
+import io
+import zipfile
+
+import cv2
+import numpy as np
+
+
+def _png(h: int = 256, w: int = 256) -> bytes:
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    return cv2.imencode(".png", cv2.GaussianBlur(image, (5, 5), 2))[1].tobytes()
+
+
+def test_hide_batch_reports_bad_files_without_aborting(api, monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "STEGANO_MAX_UPLOAD_BYTES", 500_000)
+    headers = api.login()
+    files = [
+        ("images", ("ok.png", _png(), "image/png")),
+        ("images", ("empty.png", b"", "image/png")),
+        ("images", ("huge.png", b"\0" * 600_000, "image/png")),
+        ("images", ("broken.png", b"not an image", "image/png")),
+    ]
+    response = api.post("/api/stegano/hide/batch", headers=headers, files=files,
+                        data={"format_output": "png", "algo": "lsb"})
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    names = sorted(archive.namelist())
+    assert names == ["0000_ok.png", "0001_empty.error.txt", "0002_huge.error.txt", "0003_broken.error.txt"]
+    assert b"empty" in archive.read("0001_empty.error.txt")
+    assert b"larger than" in archive.read("0002_huge.error.txt")
+
+    extracted = api.post("/api/stegano/extract", files={"stego_image": ("s.png", archive.read("0000_ok.png"))})
+    assert extracted.status_code == 201
+    assert extracted.json() == {"nom": "Doe", "prenom": "John"}
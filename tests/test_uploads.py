@@ -0,0 +1,146 @@
+import io
+import tempfile
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.uploads import UploadLimitMiddleware, upload_buffer
+
+MAX_BYTES = 10_000
+BOUNDARY = "boundary"
+
+
+class _PassThrough(BaseHTTPMiddleware):
+    # Like any BaseHTTPMiddleware: wraps `receive` between the limit and the app
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(images: List[UploadFile] = File(...)):
+        return {"count": len(images)}
+
+    app.add_middleware(_PassThrough)
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_BYTES)
+    return app
+
+
+class _ChunkedMultipart(httpx.AsyncByteStream):
+    """Multipart body sent in chunks, without a Content-Length."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    async def __aiter__(self):
+        yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"images\"; "
+               f"filename=\"a.png\"\r\nContent-Type: image/png\r\n\r\n").encode()
+        for _ in range(self.size // 1000):
+            yield b"\0" * 1000
+        yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _post_chunked(size: int) -> httpx.Response:
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(
+            "/upload",
+            content=_ChunkedMultipart(size),
+            headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+        )
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_under_limit_is_accepted():
+    response = await _post_chunked(MAX_BYTES // 2)
+    assert response.request.headers.get("content-length") is None
+    assert response.status_code == 200
+    assert response.json() == {"count": 1}
+
+
+@pytest.mark.asyncio
+async def test_chunked_body_over_limit_gets_413():
+    response = await _post_chunked(MAX_BYTES * 5)
+    assert response.request.headers.get("content-length") is None
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+
+
+@pytest.mark.asyncio
+async def test_declared_content_length_over_limit_gets_413():
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/upload", files={"images": ("a.png", b"\0" * MAX_BYTES * 2)})
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content_length", [b"abc", b"", b"-1", b"1e3"])
+async def test_malformed_content_length_gets_400(content_length):
+    # Sent as raw ASGI: HTTP clients won't send such a header
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/upload", "query_string": b"",
+             "headers": [(b"content-length", content_length)]}
+    await _app()(scope, receive, send)
+    assert messages[0]["status"] == 400
+    assert messages[1]["body"] == b'{"detail":"Invalid Content-Length"}'
+
+
+def _spooled(data: bytes, max_size: int) -> tempfile.SpooledTemporaryFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    spooled.write(data)
+    spooled.seek(0)
+    return spooled
+
+
+class _Unmappable(io.RawIOBase):
+    # Readable and seekable, but without a file descriptor
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+    def seek(self, offset, whence=0):
+        return self._data.seek(offset, whence)
+
+    def tell(self):
+        return self._data.tell()
+
+
+@pytest.mark.parametrize("make_file", [
+    lambda data: _spooled(data, max_size=1 << 20),  # still in memory
+    lambda data: _spooled(data, max_size=16),       # rolled to disk
+    io.BytesIO,
+    _Unmappable,
+], ids=["spooled-memory", "spooled-disk", "bytesio", "unmappable"])
+def test_upload_buffer_exposes_the_whole_file(make_file):
+    data = bytes(range(256)) * 8
+    upload = UploadFile(make_file(data), filename="a.png")
+    with upload_buffer(upload) as view:
+        assert bytes(view) == data
+
+
+def test_upload_buffer_rejects_empty_file():
+    with pytest.raises(HTTPException) as exc:
+        with upload_buffer(UploadFile(io.BytesIO(), filename="a.png")):
+            pass
+    assert exc.value.status_code == 400